@@ -1,7 +1,14 @@
 import pandas as pd
-from datasets import load_dataset
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+import argparse
+import time
+import sys
 import re
 
+GOLDEN_SET_SIZE = 300
+MIN_FINANCIAL_SCORE = 5  # Score floor for diversity selection
+
 # 1. SCORING DICTIONARY
 financial_terms = [
     'stock', 'market', 'share', 'price', 'invest', 'trade', 'trading', 'value', 
@@ -28,8 +35,121 @@ def analyze_quality(row):
             
     return score, word_count
 
-def main():
+def select_top(df, k):
+    """Current behaviour: top-k by raw financial_score"""
+    return df.sort_values(by='financial_score', ascending=False).head(k)
+
+def vectorize(df):
+    """Sparse, L2-normalized TF-IDF vectors (cosine similarity = dot product)"""
+    texts = df['instruction'].astype(str) + " " + df['output'].astype(str)
+    vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True, min_df=2, max_features=50000)
+    return vectorizer.fit_transform(texts)
+
+def k_center_indices(X, k, scores=None):
+    """Greedy k-center (farthest-point) selection on sparse normalized rows
+    
+    Keeps one distance-to-nearest-selected value per row and updates it with a
+    single sparse mat-vec per pick: O(k * nnz) time, O(N) extra memory, no N×N matrix.
+    Starts from the highest-scoring row.
+    """
+    n = X.shape[0]
+    k = min(k, n)
+    if k == 0:
+        return []
+    
+    first = int(np.argmax(scores)) if scores is not None else 0
+    selected = [first]
+    min_dist = 1.0 - X.dot(X[first].toarray().ravel())
+    min_dist[first] = -np.inf
+    
+    for _ in range(1, k):
+        nxt = int(np.argmax(min_dist))
+        selected.append(nxt)
+        np.minimum(min_dist, 1.0 - X.dot(X[nxt].toarray().ravel()), out=min_dist)
+        min_dist[nxt] = -np.inf
+    
+    return selected
+
+def select_diverse(df, k, min_score=MIN_FINANCIAL_SCORE, X=None):
+    """k-center selection over candidates at or above the score floor
+    
+    Raises ValueError if no candidate reaches the floor. A pool of at most k
+    rows is returned whole (nothing to choose between).
+    """
+    pool = df[df['financial_score'] >= min_score]
+    if len(pool) == 0:
+        raise ValueError(f"No candidates with financial_score >= {min_score} "
+                         f"(out of {len(df)}); lower --min-score")
+    if len(pool) <= k:
+        print(f"⚠️  Only {len(pool)} candidates with financial_score >= {min_score}, "
+              f"fewer than k={k}; keeping all of them")
+        return pool
+    if X is None:
+        X = vectorize(pool)
+    else:
+        X = X[np.flatnonzero((df['financial_score'] >= min_score).to_numpy())]
+    idx = k_center_indices(X, k, pool['financial_score'].to_numpy())
+    return pool.iloc[idx]
+
+def coverage_stats(X, selected_rows, chunk_size=10000):
+    """Cosine distance from every candidate to its nearest selected example"""
+    S = X[selected_rows].T.tocsc()
+    nearest = np.empty(X.shape[0])
+    for start in range(0, X.shape[0], chunk_size):
+        sims = X[start:start + chunk_size].dot(S)
+        nearest[start:start + chunk_size] = 1.0 - sims.max(axis=1).toarray().ravel()
+    return {
+        'mean_dist': float(nearest.mean()),
+        'p90_dist': float(np.percentile(nearest, 90)),
+        'max_dist': float(nearest.max()),
+    }
+
+def term_coverage(df):
+    """Number of distinct financial_terms that appear in a selection"""
+    text = " ".join((df['instruction'].astype(str) + " " + df['output'].astype(str)).str.lower())
+    return sum(1 for term in financial_terms if term in text)
+
+def compare_selections(df, k, min_score):
+    """Report coverage and runtime of sort-and-head vs k-center"""
+    X = vectorize(df)
+    position = pd.Series(np.arange(len(df)), index=df.index)
+    
+    start = time.time()
+    top = select_top(df, k)
+    top_time = time.time() - start
+    
+    start = time.time()
+    diverse = select_diverse(df, k, min_score, X)
+    diverse_time = time.time() - start
+    
+    print(f"Candidates: {len(df)} | k={k} | score floor={min_score}")
+    print(f"{'':22}{'top-score':>12}{'k-center':>12}")
+    results = {}
+    for name, sel, runtime in (('top-score', top, top_time), ('k-center', diverse, diverse_time)):
+        stats = coverage_stats(X, position[sel.index].to_numpy())
+        stats['terms'] = term_coverage(sel)
+        stats['mean_score'] = float(sel['financial_score'].mean())
+        stats['runtime_s'] = runtime
+        results[name] = stats
+    for key, label in (('mean_dist', 'Mean nearest dist'), ('p90_dist', 'P90 nearest dist'),
+                       ('max_dist', 'Max nearest dist'), ('terms', 'Financial terms'),
+                       ('mean_score', 'Mean fin. score'), ('runtime_s', 'Runtime (s)')):
+        print(f"{label:22}{results['top-score'][key]:>12.3f}{results['k-center'][key]:>12.3f}")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the golden candidate set")
+    parser.add_argument('--mode', choices=['top', 'diverse'], default='top',
+                        help="top: highest financial_score; diverse: k-center over TF-IDF")
+    parser.add_argument('--k', type=int, default=GOLDEN_SET_SIZE)
+    parser.add_argument('--min-score', type=int, default=MIN_FINANCIAL_SCORE,
+                        help="Score floor for diverse mode")
+    parser.add_argument('--compare', action='store_true',
+                        help="Report coverage/runtime of both modes")
+    args = parser.parse_args(argv)
+    
     print("--- 1. Loading Data ---")
+    from datasets import load_dataset  # Slow import, only needed to download
     dataset = load_dataset("gbharti/finance-alpaca", split='train')
     df = dataset.to_pandas()
     
@@ -50,9 +170,28 @@ def main():
         (df['word_count'] <= 150)
     ].copy()
     
-    # 4. RANK BY DENSITY
-    # We sort by the raw score
-    df_sorted = df_readable.sort_values(by='financial_score', ascending=False).head(300)
+    # 4. SELECT
+    try:
+        if args.compare:
+            print("--- 4a. Comparing Selection Modes ---")
+            compare_selections(df_readable, args.k, args.min_score)
+        
+        if args.mode == 'diverse':
+            # Spread the set over topics, not just the most term-dense ones
+            print("--- 4. Diversity Selection (k-center) ---")
+            df_sorted = select_diverse(df_readable, args.k, args.min_score)
+            df_sorted = df_sorted.sort_values(by='financial_score', ascending=False)
+        else:
+            # We sort by the raw score
+            print("--- 4. Rank by Density ---")
+            df_sorted = select_top(df_readable, args.k)
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    
+    if df_sorted.empty:
+        print("❌ Error: No candidates left after the word-count filter")
+        sys.exit(1)
     
     print(f"Top sample: {df_sorted.iloc[0]['financial_score']} terms in {df_sorted.iloc[0]['word_count']} words.")
 
@@ -0,0 +1,398 @@
+"""
+Generation-parameter autotuner
+
+Every teacher request used the same max_tokens/temperature/top_p. This runs
+short exploration rounds per scenario group (or per scenario) over a small
+sampling grid, measures latency, tokens, parse yield and label agreement, and
+locks in the parameters that maximize accepted examples per GPU-second.
+generate_training_data.py picks them up from data/sampling_params.json.
+Simulator runs are written to data/sampling_params.simulator.json instead and
+are never loaded by the generator.
+
+Sources:
+  simulator  local teacher simulator - free, for dry runs of the tuner itself
+  trace      cached teacher trace (teacher_trace.py) - cells seen in the trace
+  endpoint   live endpoint (paid) - short successive-halving rounds
+
+Usage:
+  python autotune.py --source trace --trace data/teacher_trace.jsonl.gz
+  python autotune.py --source simulator --by scenario
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import collections
+
+GRID = {
+    "temperature": [0.6, 0.8, 1.0],
+    "top_p": [0.9, 0.95],
+    "max_tokens": [512, 768, 1024],
+}
+PARAM_KEYS = ("max_tokens", "temperature", "top_p")
+DEFAULT_CELL = {"max_tokens": 1024, "temperature": 0.8, "top_p": 0.95}
+
+INITIAL_CALLS_PER_CELL = 4  # Doubled each successive-halving round
+CHARS_PER_TOKEN = 4         # Token estimate when the endpoint reports no usage
+OUTPUT_PATH = 'data/sampling_params.json'
+DRY_RUN_OUTPUT_PATH = 'data/sampling_params.simulator.json'
+
+
+# ============================================================
+# TUNED PARAMETERS (used by the generator)
+# ============================================================
+def scenario_group(output_type):
+    """advice_* / education_* / edge_*"""
+    return output_type.split('_')[0]
+
+
+def tune_key(scenario, by):
+    return scenario['output_type'] if by == 'scenario' else scenario_group(scenario['output_type'])
+
+
+def load_tuned_params(path=OUTPUT_PATH, allow_simulated=False):
+    """Load locked-in parameters, or {} if the tuner has not been run
+
+    Parameters tuned against the simulator are rejected unless
+    allow_simulated is set - they must never reach paid requests.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        tuned = json.load(f)
+    if tuned.get('source') == 'simulator' and not allow_simulated:
+        print(f"⚠️  Ignoring {path}: tuned against the simulator, using default sampling")
+        return {}
+    return tuned
+
+
+def sampling_for(scenario, tuned):
+    """Sampling overrides for one scenario (None = generator defaults)"""
+    if not tuned:
+        return None
+    return tuned['params'].get(tune_key(scenario, tuned['by']))
+
+
+def grid_cells(grid=GRID):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def cell_id(params):
+    return tuple(params[k] for k in PARAM_KEYS)
+
+
+# ============================================================
+# METRICS
+# ============================================================
+class CellStats:
+    """Accumulated outcome of one (key, sampling cell)"""
+
+    def __init__(self):
+        self.calls = 0
+        self.parsed = 0
+        self.agreed = 0
+        self.accepted = 0
+        self.gpu_seconds = 0.0
+        self.tokens = 0
+
+    def add(self, outcome):
+        self.calls += 1
+        self.parsed += outcome['parsed']
+        self.agreed += outcome['agreed']
+        self.accepted += outcome['accepted']
+        self.gpu_seconds += outcome['latency_s']
+        self.tokens += outcome['tokens']
+
+    def score(self):
+        """Accepted examples per GPU-second (single-stream endpoint)"""
+        return self.accepted / self.gpu_seconds if self.gpu_seconds else 0.0
+
+    def summary(self):
+        calls = max(self.calls, 1)
+        return {
+            "calls": self.calls,
+            "parse_yield": self.parsed / calls,
+            "label_agreement": self.agreed / max(self.parsed, 1),
+            "accept_rate": self.accepted / calls,
+            "mean_latency_s": self.gpu_seconds / calls,
+            "mean_tokens": self.tokens / calls,
+            "accepted_per_gpu_hour": self.score() * 3600,
+        }
+
+
+def evaluate(prediction, scenario, latency_s, tokens=None):
+    """Run one raw prediction through the current parse + validation code"""
+    import generate_training_data as gtd
+
+    result = gtd.parse_teacher_output(prediction) if prediction is not None else None
+    if tokens is None:
+        text = prediction.get('text', '') if isinstance(prediction, dict) else (prediction or '')
+        tokens = len(text) // CHARS_PER_TOKEN
+    return score_result(result, scenario, latency_s, tokens)
+
+
+def score_result(result, scenario, latency_s, tokens):
+    """Outcome of one already-parsed teacher result (None = unparsed)"""
+    from validation import check_example
+
+    failures = check_example(result, scenario) if result is not None else ["schema"]
+    return {
+        "parsed": result is not None,
+        "agreed": result is not None and "schema" not in failures
+                  and "scenario_agreement" not in failures,
+        "accepted": not failures,
+        "latency_s": latency_s,
+        "tokens": tokens,
+    }
+
+
+# ============================================================
+# SOURCES
+# ============================================================
+class SimulatedTeacher:
+    """Crude local teacher model: long answers get truncated by max_tokens,
+    high temperature breaks JSON and flips labels, edge cases are harder."""
+
+    TOKENS_PER_SECOND = 35
+    OVERHEAD_S = 0.8
+    MEAN_TOKENS = {"advice": 380, "education": 340, "edge": 420}
+    DISAGREE = {"advice": 0.03, "education": 0.05, "edge": 0.15}
+
+    def __init__(self, seed=42):
+        self.rng = random.Random(seed)
+
+    def __call__(self, scenario, sampling):
+        group = scenario_group(scenario['output_type'])
+        temperature, top_p = sampling['temperature'], sampling['top_p']
+
+        needed = max(120, int(self.rng.gauss(self.MEAN_TOKENS.get(group, 380), 90)))
+        tokens = min(needed, sampling['max_tokens'])
+
+        disagree = self.DISAGREE.get(group, 0.05) * (1 + 2 * max(temperature - 0.6, 0))
+        is_advice = scenario['should_be_advice'] != (self.rng.random() < disagree)
+        criteria = {"personalized": is_advice, "specific_action": is_advice,
+                    "persuasive_intent": is_advice}
+        text = "Output: " + json.dumps({
+            "llm_output": " ".join(["word"] * int(tokens * 0.45)),
+            "classification": "ADVICE" if is_advice else "NOT_ADVICE",
+            "reasoning": "Simulated reasoning about the three criteria.",
+            "criteria_met": criteria,
+        })
+
+        broken = 0.02 + 0.3 * max(temperature - 0.7, 0) + 0.4 * max(top_p - 0.92, 0)
+        if needed > sampling['max_tokens']:
+            text = text[:int(len(text) * sampling['max_tokens'] / needed)]
+        elif self.rng.random() < broken:
+            text = text[:-1]
+
+        latency = self.OVERHEAD_S + tokens / self.TOKENS_PER_SECOND
+        return text, latency, tokens
+
+
+def prediction_source(teacher):
+    """Adapt a teacher returning (prediction, latency_s, tokens) to an outcome source"""
+    def source(scenario, sampling):
+        prediction, latency, tokens = teacher(scenario, sampling)
+        return evaluate(prediction, scenario, latency, tokens)
+    return source
+
+
+def endpoint_source(scenario, sampling):
+    """Paid call to the live endpoint with explicit sampling parameters
+
+    Goes through the generator's call_teacher_model, so every exploration
+    call is recorded in the teacher trace like a normal generation call.
+    """
+    import generate_training_data as gtd
+
+    prompt = gtd.generate_user_prompt(scenario)
+    started = time.time()
+    result = gtd.call_teacher_model(prompt, scenario, sampling)
+    latency = time.time() - started
+    if result is not None:
+        result.pop('_logprobs', None)
+    # The raw completion stays in the trace; estimate tokens from the parsed JSON
+    tokens = len(json.dumps(result)) // CHARS_PER_TOKEN if result is not None else 0
+    return score_result(result, scenario, latency, tokens)
+
+
+def halving_rounds(n_cells, initial_calls=INITIAL_CALLS_PER_CELL):
+    """(cells, calls per cell) for each successive-halving round
+
+    Stops at the last round with more than one cell: once a single cell is
+    left it has already won, so it is not run again.
+    """
+    rounds = [(n_cells, initial_calls)]
+    while rounds[-1][0] > 1 and rounds[-1][0] // 2 > 1:
+        cells, calls = rounds[-1]
+        rounds.append((cells // 2, calls * 2))
+    return rounds
+
+
+def exploration_calls(n_cells, initial_calls=INITIAL_CALLS_PER_CELL):
+    """Total source calls explore() makes per key"""
+    return sum(cells * calls for cells, calls in halving_rounds(n_cells, initial_calls))
+
+
+def finalist_calls(n_cells, initial_calls=INITIAL_CALLS_PER_CELL):
+    """Calls accumulated by the cells that reach the final round"""
+    return sum(calls for _, calls in halving_rounds(n_cells, initial_calls))
+
+
+def explore(source, scenarios, by='group', grid=GRID, initial_calls=INITIAL_CALLS_PER_CELL):
+    """Successive halving per key: run every cell briefly, keep the better half
+
+    source(scenario, sampling) returns one outcome (see score_result). Only
+    the finalists have finalist_calls() calls; choose() with that min_calls
+    picks the halving winner instead of a noisy early-round cell.
+    """
+    pools = collections.defaultdict(list)
+    for scenario in scenarios:
+        pools[tune_key(scenario, by)].append(scenario)
+
+    results = {}
+    for key, pool in sorted(pools.items()):
+        print(f"\n[{key}] exploring {len(grid_cells(grid))} cells over {len(pool)} scenarios")
+        stats = {cell_id(c): CellStats() for c in grid_cells(grid)}
+        cells = grid_cells(grid)
+        cycle = itertools.cycle(pool)
+
+        for n_cells, calls in halving_rounds(len(cells), initial_calls):
+            cells.sort(key=lambda c: stats[cell_id(c)].score(), reverse=True)
+            cells = cells[:n_cells]
+            for cell in cells:
+                for _ in range(calls):
+                    scenario = next(cycle)
+                    stats[cell_id(cell)].add(source(scenario, cell))
+
+        results[key] = {c: s for c, s in stats.items() if s.calls}
+    return results
+
+
+def from_trace(trace_path, by='group'):
+    """Group cached trace records by key and sampling cell, re-evaluated with current code"""
+    from teacher_trace import read_trace
+
+    results = collections.defaultdict(lambda: collections.defaultdict(CellStats))
+    for record in read_trace(trace_path):
+        scenario = record.get('scenario')
+        instance = record.get('instance') or {}
+        if not scenario or record.get('latency_s') is None:
+            continue
+        params = {k: instance.get(k, DEFAULT_CELL[k]) for k in PARAM_KEYS}
+        outcome = evaluate(record.get('prediction'), scenario, record['latency_s'])
+        results[tune_key(scenario, by)][cell_id(params)].add(outcome)
+    return results
+
+
+# ============================================================
+# LOCK IN
+# ============================================================
+def choose(results, min_calls=1, min_cells=1):
+    """Best cell per key by accepted examples per GPU-second
+
+    Keys with fewer than min_cells eligible cells are skipped - with a
+    single cell there is nothing to compare against.
+    """
+    chosen = {}
+    for key, cells in sorted(results.items()):
+        eligible = {c: s for c, s in cells.items() if s.calls >= min_calls}
+        if eligible and len(eligible) < min_cells:
+            print(f"⚠️  {key}: only {len(eligible)} sampling cell(s) with >= {min_calls} calls "
+                  f"- nothing to compare, keeping generator defaults")
+            continue
+        if eligible:
+            best = max(eligible, key=lambda c: eligible[c].score())
+            # Nothing accepted anywhere: keep the generator defaults for this key
+            if eligible[best].accepted:
+                chosen[key] = (best, eligible[best])
+    return chosen
+
+
+def print_results(results, chosen):
+    print("\n" + "=" * 70)
+    print("AUTOTUNE RESULTS (accepted examples per GPU-hour)")
+    print("=" * 70)
+    default = cell_id(DEFAULT_CELL)
+    for key, (best, stats) in sorted(chosen.items()):
+        summary = stats.summary()
+        print(f"\n{key}: max_tokens={best[0]}, temperature={best[1]}, top_p={best[2]}")
+        print(f"  Calls: {summary['calls']} | Parse yield: {summary['parse_yield']*100:.1f}% | "
+              f"Label agreement: {summary['label_agreement']*100:.1f}%")
+        print(f"  Latency: {summary['mean_latency_s']:.1f}s | Tokens: {summary['mean_tokens']:.0f} | "
+              f"Accepted/GPU-hour: {summary['accepted_per_gpu_hour']:.0f}")
+        if default in results[key] and default != best:
+            base = results[key][default].summary()
+            print(f"  Default cell: {base['accepted_per_gpu_hour']:.0f}/GPU-hour "
+                  f"({base['calls']} calls)")
+
+
+def save(chosen, by, source, path=OUTPUT_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tuned = {
+        "by": by,
+        "source": source,
+        "params": {key: dict(zip(PARAM_KEYS, best)) for key, (best, _) in chosen.items()},
+        "metrics": {key: stats.summary() for key, (_, stats) in chosen.items()},
+    }
+    with open(path, 'w') as f:
+        json.dump(tuned, f, indent=2)
+    print(f"\n✓ Locked-in parameters saved to {path}")
+    return tuned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune sampling parameters per scenario")
+    parser.add_argument('--source', choices=['simulator', 'trace', 'endpoint'], default='simulator')
+    parser.add_argument('--trace', default='data/teacher_trace.jsonl.gz')
+    parser.add_argument('--by', choices=['group', 'scenario'], default='group')
+    parser.add_argument('--calls', type=int, default=INITIAL_CALLS_PER_CELL,
+                        help="Calls per cell in the first exploration round")
+    parser.add_argument('--min-calls', type=int, default=3,
+                        help="Ignore trace cells with fewer records")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=None,
+                        help=f"Default: {OUTPUT_PATH} ({DRY_RUN_OUTPUT_PATH} for the simulator)")
+    args = parser.parse_args()
+
+    if args.out is None:
+        args.out = DRY_RUN_OUTPUT_PATH if args.source == 'simulator' else OUTPUT_PATH
+    elif args.source == 'simulator' and os.path.abspath(args.out) == os.path.abspath(OUTPUT_PATH):
+        print(f"❌ Refusing to write simulator results to {OUTPUT_PATH} (used by paid runs)")
+        sys.exit(1)
+
+    from scenarios_extended import EXTENDED_SCENARIOS
+
+    if args.source == 'trace':
+        if not os.path.exists(args.trace):
+            print(f"❌ Trace not found: {args.trace}")
+            sys.exit(1)
+        results = from_trace(args.trace, args.by)
+        # The trace only covers cells the generator actually used
+        chosen = choose(results, args.min_calls, min_cells=2)
+    else:
+        if args.source == 'endpoint':
+            per_key = exploration_calls(len(grid_cells()), args.calls)
+            n_keys = len({tune_key(s, args.by) for s in EXTENDED_SCENARIOS})
+            print("\n⚠️  COST CONFIRMATION")
+            print(f"Teacher calls: {per_key} per {args.by} × {n_keys} = {per_key * n_keys} total")
+            if input("\nProceed? (yes/no): ").lower() != 'yes':
+                print("Cancelled.")
+                sys.exit(0)
+            source = endpoint_source
+        else:
+            source = prediction_source(SimulatedTeacher(args.seed))
+        results = explore(source, EXTENDED_SCENARIOS, args.by, initial_calls=args.calls)
+        # Only the finalists compete; early-round cells have too few calls to trust
+        chosen = choose(results, finalist_calls(len(grid_cells()), args.calls))
+
+    if not chosen:
+        print("❌ Nothing to lock in: no key has enough data to compare cells")
+        sys.exit(1)
+    print_results(results, chosen)
+    save(chosen, args.by, args.source, args.out)
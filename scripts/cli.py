@@ -0,0 +1,146 @@
+"""
+Single entry point for the data pipeline
+
+Heavy SDKs (google-cloud-aiplatform, tqdm, pandas, sklearn, datasets) are only
+imported by the subcommand that needs them, so stats/export/dry runs start fast
+and nothing touches Vertex AI on import.
+
+Usage:
+  python cli.py generate [--num-examples 5000]
+  python cli.py probe [--connection]
+  python cli.py debug
+  python cli.py golden-set [--mode diverse --k 300 ...]
+  python cli.py stats [--engine --limit 5000]
+  python cli.py export [--raw data/training_data_raw.json --out data/training_data_formatted.jsonl]
+  python cli.py bench-imports [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SCRIPTS_DIR)
+GOLDEN_SET_DIR = os.path.join(REPO_DIR, 'ai-innovation')
+
+COMMANDS = ['generate', 'probe', 'debug', 'golden-set', 'stats', 'export']
+
+
+def _import(name, path=SCRIPTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return __import__(name)
+
+
+def load(command, connection=False, engine=False):
+    """Import exactly the modules a subcommand needs"""
+    if command in ('generate', 'export'):
+        return _import('generate_training_data')
+    if command == 'probe':
+        return _import('test_connection', REPO_DIR) if connection else _import('test_teacher')
+    if command == 'debug':
+        return _import('debug_endpoint')
+    if command == 'golden-set':
+        return _import('create_golden_set', GOLDEN_SET_DIR)
+    if command == 'stats':
+        return _import('scenario_engine') if engine else _import('scenarios_extended')
+    raise ValueError(f"Unknown command: {command}")
+
+
+def bench_imports(repeat=3):
+    """Cold-start time per subcommand, each measured in a fresh interpreter"""
+    def best_of(args):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            proc = subprocess.run([sys.executable] + args, capture_output=True, text=True)
+            elapsed = time.perf_counter() - started
+            if proc.returncode != 0:
+                error = proc.stderr.strip().splitlines()
+                return None, error[-1] if error else f"exit {proc.returncode}"
+            best = elapsed if best is None else min(best, elapsed)
+        return best, None
+
+    baseline, _ = best_of(['-c', 'pass'])
+    print("=" * 60)
+    print(f"IMPORT-TIME BENCHMARK (best of {repeat})")
+    print("=" * 60)
+    print(f"{'python -c pass':28}{baseline*1000:>8.0f} ms")
+
+    cli = os.path.abspath(__file__)
+    variants = [(c, [c]) for c in COMMANDS] + [
+        ('probe --connection', ['probe', '--connection']),
+        ('stats --engine', ['stats', '--engine']),
+    ]
+    results = {}
+    for name, args in variants:
+        elapsed, error = best_of([cli, '--import-only'] + args)
+        results[name] = elapsed
+        if error:
+            print(f"{name:28}{'failed':>8}    ({error})")
+        else:
+            print(f"{name:28}{elapsed*1000:>8.0f} ms  (+{(elapsed - baseline)*1000:.0f} ms over bare python)")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Financial advice distillation pipeline")
+    parser.add_argument('--import-only', action='store_true', help=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    gen_p = sub.add_parser('generate', help="Generate labeled data with the teacher (paid)")
+    gen_p.add_argument('--num-examples', type=int, default=5000)
+
+    probe_p = sub.add_parser('probe', help="Smoke-test the teacher endpoint")
+    probe_p.add_argument('--connection', action='store_true',
+                         help="Only check Vertex AI / Cloud Storage access")
+
+    sub.add_parser('debug', help="Print the raw structure of one endpoint response")
+
+    # Options (--mode, --k, ...) are passed through to create_golden_set.py
+    sub.add_parser('golden-set', help="Build candidates_balanced.csv in the current directory")
+
+    stats_p = sub.add_parser('stats', help="Scenario distribution / coverage")
+    stats_p.add_argument('--engine', action='store_true', help="Stats for the combinatorial engine stream")
+    stats_p.add_argument('--limit', type=int, default=5000)
+    stats_p.add_argument('--seed', type=int, default=42)
+
+    export_p = sub.add_parser('export', help="Re-export raw examples to training JSONL")
+    export_p.add_argument('--raw', default='data/training_data_raw.json')
+    export_p.add_argument('--out', default='data/training_data_formatted.jsonl')
+
+    bench_p = sub.add_parser('bench-imports', help="Measure cold start of each subcommand")
+    bench_p.add_argument('--repeat', type=int, default=3)
+
+    args, extras = parser.parse_known_args(argv)
+    if extras and args.command != 'golden-set':
+        parser.error(f"unrecognized arguments: {' '.join(extras)}")
+
+    if args.command == 'bench-imports':
+        bench_imports(args.repeat)
+        return
+
+    module = load(args.command, connection=getattr(args, 'connection', False),
+                  engine=getattr(args, 'engine', False))
+    if args.import_only:
+        return
+
+    if args.command == 'generate':
+        module.main(num_examples=args.num_examples)
+    elif args.command in ('probe', 'debug'):
+        module.main()
+    elif args.command == 'golden-set':
+        module.main(extras)
+    elif args.command == 'stats':
+        if args.engine:
+            module.print_stream_stats(module.ScenarioEngine(seed=args.seed), limit=args.limit)
+        else:
+            module.print_scenario_stats()
+    elif args.command == 'export':
+        module.export_formatted(args.raw, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Queue-aware lifecycle manager for the teacher endpoint
+
+Replaces the fixed-timer auto_undeploy.sh. The endpoint is undeployed as soon as:
+  - the work queue drains (all requested examples generated)
+  - throughput stays below a threshold for N minutes (run stalled on errors)
+  - the estimated spend reaches the budget, or the projected total (spend so
+    far + remaining work at current throughput) would exceed it
+It also provides a warm-up gate that holds requests until the endpoint answers.
+
+All gcloud/Vertex calls go through an EndpointController so the logic can be
+exercised with a stub controller (no credentials needed).
+"""
+
+import time
+import collections
+
+# ============================================================
+# DEFAULT THRESHOLDS
+# ============================================================
+MIN_EXAMPLES_PER_MINUTE = 1.0   # Below this the run counts as stalled
+STALL_MINUTES = 15              # How long throughput may stay low before undeploy
+THROUGHPUT_WINDOW_MINUTES = 5   # Sliding window used to measure throughput
+WARMUP_TIMEOUT_MINUTES = 30     # Give up waiting for the endpoint after this
+WARMUP_POLL_SECONDS = 30
+
+
+class EndpointController:
+    """Interface for the calls that touch the deployed endpoint"""
+
+    def is_ready(self):
+        """Return True once the endpoint can serve predictions"""
+        raise NotImplementedError
+
+    def undeploy(self):
+        """Undeploy every model from the endpoint"""
+        raise NotImplementedError
+
+
+class VertexEndpointController(EndpointController):
+    """Controller backed by the Vertex AI SDK"""
+
+    def __init__(self, endpoint_id, project=None, region=None):
+        self.endpoint_id = endpoint_id
+        self.project = project
+        self.region = region
+        self._endpoint = None
+
+    def _get_endpoint(self):
+        if self._endpoint is None:
+            # Imported lazily so the lifecycle logic loads without the SDK
+            from google.cloud import aiplatform
+            aiplatform.init(project=self.project, location=self.region)
+            self._endpoint = aiplatform.Endpoint(self.endpoint_id)
+        return self._endpoint
+
+    def is_ready(self):
+        try:
+            endpoint = self._get_endpoint()
+            if not endpoint.list_models():
+                return False
+            # Tiny probe request - a deployed but cold model fails here
+            endpoint.predict(instances=[{"prompt": "ping", "max_tokens": 1}])
+            return True
+        except Exception as e:
+            print(f"[LIFECYCLE] Endpoint not ready: {e}")
+            return False
+
+    def undeploy(self):
+        self._get_endpoint().undeploy_all()
+
+
+class DryRunController(EndpointController):
+    """Controller that only logs - for dry runs and local simulation"""
+
+    def __init__(self):
+        self.undeployed = False
+
+    def is_ready(self):
+        return True
+
+    def undeploy(self):
+        print("[LIFECYCLE] (dry run) would undeploy endpoint")
+        self.undeployed = True
+
+
+class EndpointLifecycle:
+    """Decides when the endpoint should be undeployed, and does it once"""
+
+    def __init__(self, controller, total_work, cost_per_hour, max_budget_eur,
+                 min_per_minute=MIN_EXAMPLES_PER_MINUTE,
+                 stall_minutes=STALL_MINUTES,
+                 window_minutes=THROUGHPUT_WINDOW_MINUTES,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.controller = controller
+        self.total_work = total_work
+        self.cost_per_hour = cost_per_hour
+        self.max_budget_eur = max_budget_eur
+        self.min_per_minute = min_per_minute
+        self.stall_seconds = stall_minutes * 60
+        self.window_seconds = window_minutes * 60
+        self.clock = clock
+        self.sleep = sleep
+
+        self.start_time = clock()
+        self.warm_time = self.start_time
+        self.completed = 0
+        self.completions = collections.deque()
+        self.low_since = None
+        self.ready = False
+        self.stop_reason = None
+        self.undeployed = False
+
+    # ------------------------------------------------------------
+    # Warm-up gate
+    # ------------------------------------------------------------
+    def wait_until_ready(self, timeout_minutes=WARMUP_TIMEOUT_MINUTES,
+                         poll_seconds=WARMUP_POLL_SECONDS):
+        """Block until the endpoint is ready. Returns False on timeout."""
+        if self.ready:
+            return True
+
+        deadline = self.clock() + timeout_minutes * 60
+        while not self.controller.is_ready():
+            if self.clock() >= deadline:
+                print(f"[LIFECYCLE] Endpoint not ready after {timeout_minutes} min")
+                return False
+            print(f"[LIFECYCLE] Waiting for endpoint warm-up ({poll_seconds}s)...")
+            self.sleep(poll_seconds)
+
+        self.ready = True
+        # Throughput is measured from the moment the endpoint can serve
+        self.low_since = None
+        self.completions.clear()
+        self.warm_time = self.clock()
+        return True
+
+    # ------------------------------------------------------------
+    # Progress tracking
+    # ------------------------------------------------------------
+    def record_completion(self, count=1):
+        """Register finished work items (accepted examples)"""
+        now = self.clock()
+        self.completed += count
+        for _ in range(count):
+            self.completions.append(now)
+
+    def elapsed_hours(self):
+        return (self.clock() - self.start_time) / 3600
+
+    def spent_eur(self):
+        return self.elapsed_hours() * self.cost_per_hour
+
+    def throughput_per_minute(self):
+        """Completions per minute over the sliding window"""
+        now = self.clock()
+        while self.completions and now - self.completions[0] > self.window_seconds:
+            self.completions.popleft()
+
+        window = min(self.window_seconds, now - self.warm_time)
+        if window <= 0:
+            return None
+        return len(self.completions) / (window / 60)
+
+    def projected_cost_eur(self):
+        """Estimated total cost if the remaining work runs at current throughput"""
+        rate = self.throughput_per_minute()
+        remaining = max(self.total_work - self.completed, 0)
+        if not rate:
+            return None
+        return self.spent_eur() + (remaining / rate / 60) * self.cost_per_hour
+
+    # ------------------------------------------------------------
+    # Undeploy decision
+    # ------------------------------------------------------------
+    def check(self):
+        """Return the reason the run should stop, or None to keep going"""
+        if self.stop_reason:
+            return self.stop_reason
+
+        if self.completed >= self.total_work:
+            return self._stop("queue_drained")
+
+        if self.spent_eur() >= self.max_budget_eur:
+            return self._stop("budget")
+
+        now = self.clock()
+        rate = self.throughput_per_minute()
+        # Only judge a full window of data, otherwise startup looks like a stall
+        if rate is not None and now - self.warm_time >= self.window_seconds:
+            if rate < self.min_per_minute:
+                if self.low_since is None:
+                    self.low_since = now
+                elif now - self.low_since >= self.stall_seconds:
+                    return self._stop("throughput_collapse")
+            else:
+                self.low_since = None
+
+            # Stop early rather than find out at the budget line that the rest won't fit
+            projected = self.projected_cost_eur()
+            if projected is not None and projected > self.max_budget_eur:
+                return self._stop("projected_budget")
+
+        return None
+
+    def finish(self, reason=None):
+        """Undeploy at the end of the run (queue drained or loop exited)"""
+        if not self.stop_reason:
+            if reason is None:
+                reason = "queue_drained" if self.completed >= self.total_work else "run_finished"
+            self._stop(reason)
+        return self.stop_reason
+
+    def _stop(self, reason):
+        self.stop_reason = reason
+        print(f"\n🛑 [LIFECYCLE] Undeploying endpoint - reason: {reason}")
+        print(f"   Completed: {self.completed}/{self.total_work}")
+        print(f"   Elapsed: {self.elapsed_hours():.2f}h | Est. cost: €{self.spent_eur():.2f}")
+        try:
+            self.controller.undeploy()
+            self.undeployed = True
+            print("✓ Endpoint undeployed")
+        except Exception as e:
+            print(f"❌ Undeploy failed: {e}")
+            print("Run: gcloud ai endpoints undeploy-model YOUR_ENDPOINT_ID --region=YOUR_REGION")
+        return reason
+
+    def status_line(self):
+        rate = self.throughput_per_minute()
+        projected = self.projected_cost_eur()
+        rate_str = f"{rate:.1f}/min" if rate is not None else "n/a"
+        projected_str = f"€{projected:.2f}" if projected is not None else "n/a"
+        return (f"💰 Elapsed: {self.elapsed_hours():.2f}h | Est. cost: €{self.spent_eur():.2f} | "
+                f"Throughput: {rate_str} | Projected total: {projected_str}")
+
+
+if __name__ == "__main__":
+    # Standalone watchdog: hard timer fallback, same as the old auto_undeploy.sh
+    import sys
+    import os
+
+    if len(sys.argv) < 2:
+        print("Usage: python endpoint_lifecycle.py ENDPOINT_ID [REGION] [HOURS]")
+        exit(1)
+
+    endpoint_id = sys.argv[1]
+    region = sys.argv[2] if len(sys.argv) > 2 else "europe-west4"
+    hours = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print(f"Will auto-stop endpoint {endpoint_id} after {hours} hours")
+    time.sleep(hours * 3600)
+    print("⏰ Time limit reached - stopping endpoint...")
+    VertexEndpointController(endpoint_id, os.getenv('PROJECT_ID'), region).undeploy()
+    print("✓ Endpoint stopped")
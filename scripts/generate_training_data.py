@@ -1,8 +1,7 @@
 import os
 import json
-from tqdm import tqdm
 import time
-from google.cloud import aiplatform
+import itertools
 from dotenv import load_dotenv
 import sys
 
@@ -13,17 +12,42 @@ PROJECT_ID = os.getenv('PROJECT_ID')
 REGION = os.getenv('REGION')
 ENDPOINT_ID = os.getenv('TEACHER_ENDPOINT_ID')
 
+# Scenario source: fixed EXTENDED_SCENARIOS, or the combinatorial engine
+USE_SCENARIO_ENGINE = os.getenv('USE_SCENARIO_ENGINE') == '1'
+SCENARIO_SEED = int(os.getenv('SCENARIO_SEED', '42'))
+SHARD_INDEX = int(os.getenv('SHARD_INDEX', '0'))
+NUM_SHARDS = int(os.getenv('NUM_SHARDS', '1'))
+
+# Distillation: keep top-k teacher logprobs for reasoning/label tokens
+CAPTURE_LOGPROBS = os.getenv('CAPTURE_LOGPROBS') == '1'
+LOGPROB_TOP_K = int(os.getenv('LOGPROB_TOP_K', '20'))
+LOGPROB_PREFIX = 'data/teacher_logprobs'
+# Only needed if the server cannot return token ids (vLLM: return_tokens_as_token_ids)
+LOGPROB_TOKENIZER = os.getenv('LOGPROB_TOKENIZER')
+
+# Sampling parameters; per-scenario overrides are locked in by autotune.py
+DEFAULT_SAMPLING = {"max_tokens": 1024, "temperature": 0.8, "top_p": 0.95}
+SAMPLING_PARAMS_PATH = os.getenv('SAMPLING_PARAMS_PATH', 'data/sampling_params.json')
+
+RECORD_TRACE = os.getenv('RECORD_TRACE', '1') == '1'
+TRACE_PATH = os.getenv('TRACE_PATH', 'data/teacher_trace.jsonl.gz')
+
 # ============================================================
 # COST SAFETY LIMITS - DO NOT EXCEED
 # ============================================================
 MAX_EXAMPLES = 5000  # Hard cap on examples to generate
+CHECKPOINT_EVERY = 100  # Accepted examples between checkpoints
 MAX_RUNTIME_HOURS = 24  # Auto-stop after 24 hours
 ESTIMATED_COST_PER_HOUR = 4  # €4/hour for g4-standard-96 (2× RTX PRO 6000)
 MAX_BUDGET_EUR = 100  # Stop if estimated cost exceeds €30
+AUTO_UNDEPLOY = True  # Undeploy endpoint when queue drains, run stalls or budget is hit
 
 # Track start time
 import datetime
 START_TIME = datetime.datetime.now()
+# Prefix of example ids, which must stay unique across runs and shards
+# because the logprob sidecar is append-only
+RUN_ID = os.getenv('RUN_ID') or START_TIME.strftime('%Y%m%d-%H%M%S')
 
 def check_cost_limit():
     """Safety check: Stop if estimated cost exceeds budget"""
@@ -44,9 +68,56 @@ def check_cost_limit():
 
 # Import scenarios
 from scenarios_extended import EXTENDED_SCENARIOS as SCENARIOS
+from scenario_engine import ScenarioEngine
+from endpoint_lifecycle import EndpointLifecycle, VertexEndpointController
+from teacher_trace import TraceRecorder
+from validation import ValidationStats, check_example
+from autotune import load_tuned_params, sampling_for
+
+if USE_SCENARIO_ENGINE:
+    # One quota per class (ADVICE / NOT_ADVICE), each attempt draws a fresh
+    # deduplicated context from that class's stratified stream
+    SCENARIO_ENGINE = ScenarioEngine(
+        seed=SCENARIO_SEED, shard_index=SHARD_INDEX, num_shards=NUM_SHARDS
+    )
+    SCENARIO_GROUPS = SCENARIO_ENGINE.class_groups()
+else:
+    # Fixed scenarios: every attempt reuses the same context
+    SCENARIO_ENGINE = None
+    SCENARIO_GROUPS = [(s, itertools.repeat(s)) for s in SCENARIOS]
+
+
+def scenario_quotas(num_examples):
+    """Examples to generate per entry of SCENARIO_GROUPS
+
+    Engine runs split by class at the engine's advice_ratio and raise
+    ValueError if a class cannot fill its share; fixed scenarios split evenly.
+    """
+    if SCENARIO_ENGINE is not None:
+        quotas = SCENARIO_ENGINE.class_quotas(num_examples)
+        return [quotas[scenario['should_be_advice']] for scenario, _ in SCENARIO_GROUPS]
+    return [num_examples // len(SCENARIO_GROUPS)] * len(SCENARIO_GROUPS)
+
+# Teacher endpoint, created on first use so parsing/replay work offline
+_ENDPOINT = None
+
+def get_endpoint():
+    """Initialize Vertex AI and return the (cached) teacher endpoint"""
+    global _ENDPOINT
+    if _ENDPOINT is None:
+        from google.cloud import aiplatform
+        aiplatform.init(project=PROJECT_ID, location=REGION)
+        _ENDPOINT = aiplatform.Endpoint(ENDPOINT_ID)
+    return _ENDPOINT
+
+# Autotuned sampling parameters (empty if autotune.py has not been run)
+TUNED_SAMPLING = load_tuned_params(SAMPLING_PARAMS_PATH)
+
+# Per-rule rejection counts for this run
+VALIDATION = ValidationStats()
 
-# Initialize Vertex AI
-aiplatform.init(project=PROJECT_ID, location=REGION)
+# Request/response trace for offline replay (RECORD_TRACE=0 to disable)
+TRACE = TraceRecorder(TRACE_PATH) if RECORD_TRACE else None
 
 # System prompt (keep as before)
 SYSTEM_PROMPT = """You are an expert at financial regulation compliance.
@@ -84,91 +155,143 @@ Then classify it according to the financial advice criteria.
 
 Respond ONLY with valid JSON in the exact format specified."""
 
-def call_teacher_model(prompt):
-    """Call endpoint and extract FIRST valid JSON object"""
-    try:
-        endpoint = aiplatform.Endpoint(ENDPOINT_ID)
-        
-        full_prompt = f"""You are a financial compliance expert. Generate a realistic financial Q&A example and classify it.
+def build_teacher_instance(prompt, sampling=None):
+    """Build the prediction request for one user prompt"""
+    full_prompt = f"""You are a financial compliance expert. Generate a realistic financial Q&A example and classify it.
 
 {prompt}
 
 Respond with ONLY valid JSON (no extra text):
 {{"llm_output": "...", "classification": "ADVICE", "reasoning": "...", "criteria_met": {{"personalized": true, "specific_action": true, "persuasive_intent": true}}}}"""
+    
+    instance = {"prompt": full_prompt, **DEFAULT_SAMPLING, **(sampling or {})}
+    if CAPTURE_LOGPROBS:
+        instance["logprobs"] = LOGPROB_TOP_K
+        # The sidecar stores token ids; string tokens would need a tokenizer
+        instance["return_tokens_as_token_ids"] = True
+    return instance
+
+
+def parse_teacher_output(prediction):
+    """Extract FIRST valid JSON object from a raw endpoint prediction"""
+    logprobs = None
+    if isinstance(prediction, dict):
+        # Logprob-enabled responses come back as {"text": ..., "logprobs": {...}}
+        logprobs = prediction.get('logprobs')
+        prediction = prediction.get('text', '')
+    raw_text = prediction
+    output_text = prediction
+    base_offset = 0
+    
+    # Remove prefix labels
+    if "Output:" in output_text:
+        base_offset = output_text.index("Output:") + len("Output:")
+        output_text = output_text.split("Output:")[1]
+    
+    # Find first opening brace
+    start_idx = output_text.find('{')
+    if start_idx == -1:
+        return None
+    
+    # Parse incrementally to find first complete JSON object
+    brace_count = 0
+    in_string = False
+    escape_next = False
+    
+    for i, char in enumerate(output_text[start_idx:], start=start_idx):
+        if escape_next:
+            escape_next = False
+            continue
+            
+        if char == '\\':
+            escape_next = True
+            continue
         
-        response = endpoint.predict(
-            instances=[{
-                "prompt": full_prompt,
-                "max_tokens": 1024,
-                "temperature": 0.8,
-                "top_p": 0.95,
-            }]
-        )
-        
-        output_text = response.predictions[0]
-        
-        # Remove prefix labels
-        if "Output:" in output_text:
-            output_text = output_text.split("Output:")[1]
-        
-        # Find first opening brace
-        start_idx = output_text.find('{')
-        if start_idx == -1:
-            return None
-        
-        # Parse incrementally to find first complete JSON object
-        brace_count = 0
-        in_string = False
-        escape_next = False
+        if char == '"' and not escape_next:
+            in_string = not in_string
+            continue
         
-        for i, char in enumerate(output_text[start_idx:], start=start_idx):
-            if escape_next:
-                escape_next = False
-                continue
+        if not in_string:
+            if char == '{':
+                brace_count += 1
+            elif char == '}':
+                brace_count -= 1
                 
-            if char == '\\':
-                escape_next = True
-                continue
-            
-            if char == '"' and not escape_next:
-                in_string = not in_string
-                continue
-            
-            if not in_string:
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                    
-                    # Found complete JSON object
-                    if brace_count == 0:
-                        json_str = output_text[start_idx:i+1]
+                # Found complete JSON object
+                if brace_count == 0:
+                    json_str = output_text[start_idx:i+1]
+                    try:
                         result = json.loads(json_str)
-                        
-                        # Validate required fields
-                        if 'llm_output' in result and 'classification' in result:
-                            if 'reasoning' not in result:
-                                result['reasoning'] = "Generated classification"
-                            if 'criteria_met' not in result:
-                                is_advice = result['classification'] == 'ADVICE'
-                                result['criteria_met'] = {
-                                    "personalized": is_advice,
-                                    "specific_action": is_advice,
-                                    "persuasive_intent": is_advice
-                                }
-                            return result
-                        else:
-                            return None
-        
-        return None
-        
-    except json.JSONDecodeError as e:
-        return None
+                    except json.JSONDecodeError:
+                        return None
+                    
+                    # Validate required fields
+                    # Missing reasoning/criteria_met are left missing for validation to reject
+                    if 'llm_output' in result and 'classification' in result:
+                        if CAPTURE_LOGPROBS and logprobs:
+                            # Popped by the caller before the example is saved
+                            result['_logprobs'] = {
+                                "logprobs": logprobs,
+                                "raw_text": raw_text,
+                                "json_start": base_offset + start_idx,
+                            }
+                        return result
+                    else:
+                        return None
+    
+    return None
+
+
+def trace_prediction(prediction):
+    """Prediction as stored in the trace: top-k logprobs live in the sidecar only"""
+    if isinstance(prediction, dict) and prediction.get('logprobs'):
+        return {**{k: v for k, v in prediction.items() if k != 'logprobs'},
+                "logprobs_captured": True}
+    return prediction
+
+
+def call_teacher_model(prompt, scenario=None, sampling=None):
+    """Call endpoint and extract FIRST valid JSON object"""
+    if sampling is None and scenario is not None:
+        sampling = sampling_for(scenario, TUNED_SAMPLING)
+    instance = build_teacher_instance(prompt, sampling)
+    prediction = None
+    error = None
+    started = time.time()
+    try:
+        response = get_endpoint().predict(instances=[instance])
+        prediction = response.predictions[0]
+        result = parse_teacher_output(prediction)
     except Exception as e:
         print(f"[DEBUG] Error: {e}")
-        return None
+        error = str(e)
+        result = None
+    
+    if TRACE is not None:
+        TRACE.record(
+            scenario=scenario,
+            instance=instance,
+            prediction=trace_prediction(prediction),
+            latency_s=time.time() - started,
+            parsed=result is not None,
+            error=error,
+        )
+    return result
 
 
+def validate_example(result, scenario):
+    """Accept or reject a parsed teacher result for a scenario (see validation.py)"""
+    if result is None:
+        # Nothing to validate - kept out of the rule counts, as in trace replay
+        VALIDATION.record_unparsed(scenario['output_type'])
+        return None
+    failures = check_example(result, scenario)
+    VALIDATION.record(scenario['output_type'], failures)
+    if failures:
+        return None
+    result['scenario_type'] = scenario['output_type']
+    return result
+
 
 def generate_example(scenario, retry_count=2):
     """Generate one example with debug output"""
@@ -176,10 +299,9 @@ def generate_example(scenario, retry_count=2):
     
     for attempt in range(retry_count):
         print(f"\n[DEBUG] Attempt {attempt+1}/{retry_count} for scenario: {scenario['output_type']}")
-        result = call_teacher_model(prompt)
+        result = validate_example(call_teacher_model(prompt, scenario), scenario)
         
-        if result and 'llm_output' in result and 'classification' in result:
-            result['scenario_type'] = scenario['output_type']
+        if result:
             print(f"[DEBUG] ✓ Success: {result['classification']}")
             return result
         else:
@@ -192,14 +314,67 @@ def generate_example(scenario, retry_count=2):
     return None
 
 
-def create_training_dataset(num_examples=5000):
-    """Generate training dataset with safety limits"""
+def format_example(item):
+    """Convert a raw example into the instruction-tuning record"""
+    return {
+        "example_id": item['example_id'],
+        "instruction": "Classify whether this LLM output constitutes financial advice. Provide reasoning then label.",
+        "input": item['llm_output'],
+        "reasoning": item['reasoning'],
+        "output": item['classification']
+    }
+
+
+def save_logprobs(writer, example_id, capture, token_to_id=None):
+    """Write captured teacher logprobs to the sidecar; never fails the example
+
+    Returns False if capture cannot work for this endpoint at all (token
+    strings without a tokenizer mapping), so the caller can stop capturing.
+    """
+    from logprob_store import parse_logprobs, TokenIdError
+    try:
+        parsed = parse_logprobs(capture["logprobs"], k=writer.k, token_to_id=token_to_id)
+        if parsed is not None:
+            writer.add(example_id, parsed, capture["raw_text"], capture["json_start"])
+            writer.flush()
+    except TokenIdError as e:
+        print(f"\n❌ Logprob capture disabled for this run: {e}")
+        print("   Serve with return_tokens_as_token_ids support or set LOGPROB_TOKENIZER")
+        return False
+    except Exception as e:
+        print(f"[DEBUG] Could not store logprobs for {example_id}: {e}")
+    return True
+
+
+def save_checkpoint(dataset, path='data/training_data_checkpoint.json'):
+    with open(path, 'w') as f:
+        json.dump(dataset, f, indent=2)
+
+
+def create_training_dataset(num_examples=5000, lifecycle=None):
+    """Generate training dataset with safety limits
+    
+    If a lifecycle (EndpointLifecycle) is given, requests are held until the
+    endpoint is warm and the endpoint is undeployed as soon as the queue drains,
+    throughput collapses or the budget is hit.
+    """
+    
+    # Imported here so importing this module (CLI, replay, autotune) stays fast
+    from tqdm import tqdm
     
     # Safety check: Don't exceed MAX_EXAMPLES
     num_examples = min(num_examples, MAX_EXAMPLES)
     
     dataset = []
-    examples_per_scenario = num_examples // len(SCENARIOS)
+    quotas = scenario_quotas(num_examples)
+    
+    if lifecycle is not None:
+        # Work queue is what we actually schedule, not the rounded-off request
+        lifecycle.total_work = sum(quotas)
+        if not lifecycle.wait_until_ready():
+            print("\n🛑 STOPPING GENERATION - Endpoint never became ready")
+            lifecycle.finish("not_ready")
+            return dataset
     
     print("=" * 70)
     print("SYNTHETIC DATA GENERATION WITH COST SAFEGUARDS")
@@ -209,56 +384,129 @@ def create_training_dataset(num_examples=5000):
     print(f"Max budget: €{MAX_BUDGET_EUR}")
     print(f"Estimated cost per hour: €{ESTIMATED_COST_PER_HOUR}")
     print(f"Endpoint: {ENDPOINT_ID}")
+    if CAPTURE_LOGPROBS:
+        print(f"Logprob capture: top-{LOGPROB_TOP_K} -> {LOGPROB_PREFIX}.*")
     print("=" * 70)
     
-    for scenario_idx, scenario in enumerate(SCENARIOS):
-        print(f"\n[{scenario_idx+1}/{len(SCENARIOS)}] Generating {examples_per_scenario} examples for: {scenario['output_type']}")
-        
-        successful = 0
-        attempts = 0
-        max_attempts = examples_per_scenario * 2
-        
-        progress_bar = tqdm(total=examples_per_scenario)
-        
-        while successful < examples_per_scenario and attempts < max_attempts:
-            # ⚠️ SAFETY CHECK: Stop if cost limit reached
-            if not check_cost_limit():
-                progress_bar.close()
-                print(f"\n🛑 STOPPING GENERATION - Safety limit reached")
-                print(f"Generated {len(dataset)} examples so far")
-                return dataset
+    logprob_writer = None
+    token_to_id = None
+    if CAPTURE_LOGPROBS:
+        from logprob_store import LogprobWriter, tokenizer_token_map
+        logprob_writer = LogprobWriter(LOGPROB_PREFIX, k=LOGPROB_TOP_K)
+        if LOGPROB_TOKENIZER:
+            token_to_id = tokenizer_token_map(LOGPROB_TOKENIZER)
+    
+    try:
+        for scenario_idx, (scenario, contexts) in enumerate(SCENARIO_GROUPS):
+            examples_per_scenario = quotas[scenario_idx]
+            print(f"\n[{scenario_idx+1}/{len(SCENARIO_GROUPS)}] Generating {examples_per_scenario} examples for: {scenario['output_type']}")
             
-            example = generate_example(scenario)
-            attempts += 1
+            successful = 0
+            attempts = 0
+            max_attempts = examples_per_scenario * 2
             
-            if example:
-                dataset.append(example)
-                successful += 1
-                progress_bar.update(1)
+            progress_bar = tqdm(total=examples_per_scenario)
             
-            # Rate limiting
-            if attempts % 10 == 0:
-                time.sleep(2)
+            while successful < examples_per_scenario and attempts < max_attempts:
+                # ⚠️ SAFETY CHECK: Stop if cost limit reached
+                if not check_cost_limit():
+                    progress_bar.close()
+                    print(f"\n🛑 STOPPING GENERATION - Safety limit reached")
+                    print(f"Generated {len(dataset)} examples so far")
+                    if lifecycle is not None:
+                        lifecycle.finish("safety_limit")
+                    return dataset
                 
-                # Print cost estimate every 10 attempts
-                elapsed = (datetime.datetime.now() - START_TIME).total_seconds() / 3600
-                estimated_cost = elapsed * ESTIMATED_COST_PER_HOUR
-                print(f"\n💰 Elapsed: {elapsed:.2f}h | Est. cost: €{estimated_cost:.2f}")
-        
-        progress_bar.close()
-        print(f"  ✓ Generated {successful}/{examples_per_scenario}")
+                # ⚠️ LIFECYCLE CHECK: Stop on stalled throughput or projected budget
+                if lifecycle is not None and lifecycle.check():
+                    progress_bar.close()
+                    print(f"\n🛑 STOPPING GENERATION - Endpoint undeployed ({lifecycle.stop_reason})")
+                    print(f"Generated {len(dataset)} examples so far")
+                    return dataset
+                
+                concrete = next(contexts, None)
+                if concrete is None:
+                    print(f"\n❌ Scenario space exhausted for {scenario['output_type']} - "
+                          f"class ratio will be off ({successful}/{examples_per_scenario})")
+                    break
+                
+                example = generate_example(concrete)
+                attempts += 1
+                
+                if example:
+                    example['example_id'] = f"{RUN_ID}-s{SHARD_INDEX}-{len(dataset)}"
+                    capture = example.pop('_logprobs', None)
+                    if logprob_writer is not None and capture:
+                        if not save_logprobs(logprob_writer, example['example_id'], capture, token_to_id):
+                            logprob_writer.close()
+                            logprob_writer = None
+                    dataset.append(example)
+                    successful += 1
+                    # Engine groups are whole classes (~2500 each): don't wait for the group to end
+                    if len(dataset) % CHECKPOINT_EVERY == 0:
+                        save_checkpoint(dataset)
+                    progress_bar.update(1)
+                    if lifecycle is not None:
+                        lifecycle.record_completion()
+                
+                # Rate limiting
+                if attempts % 10 == 0:
+                    time.sleep(2)
+                    
+                    # Print cost estimate every 10 attempts
+                    elapsed = (datetime.datetime.now() - START_TIME).total_seconds() / 3600
+                    estimated_cost = elapsed * ESTIMATED_COST_PER_HOUR
+                    if lifecycle is not None:
+                        print(f"\n{lifecycle.status_line()}")
+                    else:
+                        print(f"\n💰 Elapsed: {elapsed:.2f}h | Est. cost: €{estimated_cost:.2f}")
+            
+            progress_bar.close()
+            print(f"  ✓ Generated {successful}/{examples_per_scenario}")
+            
+            # Save progress after each scenario
+            save_checkpoint(dataset)
         
-        # Save progress after each scenario
-        with open('data/training_data_checkpoint.json', 'w') as f:
-            json.dump(dataset, f, indent=2)
+        if lifecycle is not None:
+            lifecycle.finish()
+    finally:
+        if lifecycle is not None:
+            # No-op after a clean stop; undeploys on Ctrl-C or any error in the loop
+            lifecycle.finish("error")
+        if dataset:
+            # Early stops and crashes keep everything accepted so far
+            save_checkpoint(dataset)
     
     return dataset
 
-if __name__ == "__main__":
+def export_formatted(raw_path='data/training_data_raw.json',
+                     output_path='data/training_data_formatted.jsonl'):
+    """Re-export raw examples to the instruction-tuning JSONL"""
+    with open(raw_path) as f:
+        training_data = json.load(f)
+    
+    with open(output_path, 'w') as f:
+        for i, item in enumerate(training_data):
+            # Runs from before example_id existed are numbered by position
+            f.write(json.dumps(format_example({'example_id': i, **item})) + '\n')
+    
+    print(f"✓ Exported {len(training_data)} examples to {output_path}")
+    return len(training_data)
+
+
+def main(num_examples=5000):
+    """Interactive generation run: confirm cost, generate, save, report"""
     # Check endpoint is set
     if not ENDPOINT_ID:
         print("❌ Error: TEACHER_ENDPOINT_ID not set in .env file")
-        exit(1)
+        sys.exit(1)
+    
+    # Fail before any spend if the requested class ratio cannot be met
+    try:
+        scenario_quotas(min(num_examples, MAX_EXAMPLES))
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
     
     # Confirm before starting
     print("\n⚠️  COST CONFIRMATION")
@@ -268,10 +516,18 @@ if __name__ == "__main__":
     
     if response.lower() != 'yes':
         print("Cancelled.")
-        exit(0)
+        return
     
     # Generate data
-    training_data = create_training_dataset(num_examples=5000)
+    lifecycle = None
+    if AUTO_UNDEPLOY:
+        lifecycle = EndpointLifecycle(
+            VertexEndpointController(ENDPOINT_ID, PROJECT_ID, REGION),
+            total_work=num_examples,
+            cost_per_hour=ESTIMATED_COST_PER_HOUR,
+            max_budget_eur=MAX_BUDGET_EUR,
+        )
+    training_data = create_training_dataset(num_examples=num_examples, lifecycle=lifecycle)
     
     # Calculate actual cost
     elapsed_hours = (datetime.datetime.now() - START_TIME).total_seconds() / 3600
@@ -285,35 +541,41 @@ if __name__ == "__main__":
     print(f"Estimated cost: €{actual_cost:.2f}")
     print("=" * 70)
     
-    # Save final data
-    print("\nSaving data...")
-    with open('data/training_data_raw.json', 'w') as f:
-        json.dump(training_data, f, indent=2)
-    
-    # Format for training
-    formatted_data = []
-    for item in training_data:
-        formatted_data.append({
-            "instruction": "Classify whether this LLM output constitutes financial advice. Provide reasoning then label.",
-            "input": item['llm_output'],
-            "reasoning": item['reasoning'],
-            "output": item['classification']
-        })
-    
-    with open('data/training_data_formatted.jsonl', 'w') as f:
-        for item in formatted_data:
-            f.write(json.dumps(item) + '\n')
-    
-    print("✓ Data saved!")
-    
-    # Statistics
-    advice_count = sum(1 for d in training_data if d['classification'] == 'ADVICE')
-    not_advice_count = len(training_data) - advice_count
-    
-    print(f"\nDataset Statistics:")
-    print(f"  Total: {len(training_data)}")
-    print(f"  ADVICE: {advice_count} ({advice_count/len(training_data)*100:.1f}%)")
-    print(f"  NOT_ADVICE: {not_advice_count} ({not_advice_count/len(training_data)*100:.1f}%)")
-    
-    print("\n⚠️  IMPORTANT: Remember to undeploy your endpoint to stop charges!")
-    print("Run: gcloud ai endpoints undeploy-model YOUR_ENDPOINT_ID --region=YOUR_REGION")
+    if training_data:
+        # Save final data
+        print("\nSaving data...")
+        with open('data/training_data_raw.json', 'w') as f:
+            json.dump(training_data, f, indent=2)
+        
+        # Format for training
+        with open('data/training_data_formatted.jsonl', 'w') as f:
+            for item in training_data:
+                f.write(json.dumps(format_example(item)) + '\n')
+        
+        print("✓ Data saved!")
+        
+        # Statistics
+        advice_count = sum(1 for d in training_data if d['classification'] == 'ADVICE')
+        not_advice_count = len(training_data) - advice_count
+        
+        print(f"\nDataset Statistics:")
+        print(f"  Total: {len(training_data)}")
+        print(f"  ADVICE: {advice_count} ({advice_count/len(training_data)*100:.1f}%)")
+        print(f"  NOT_ADVICE: {not_advice_count} ({not_advice_count/len(training_data)*100:.1f}%)")
+    else:
+        # Early lifecycle stop or all-error run: keep the previous run's files
+        print("\n⚠️  No examples generated - existing data/training_data_*.json(l) left untouched")
+    
+    os.makedirs('data', exist_ok=True)
+    VALIDATION.print_report()
+    VALIDATION.save('data/validation_report.json')
+    
+    if lifecycle is not None and lifecycle.undeployed:
+        print(f"\n✓ Endpoint undeployed automatically ({lifecycle.stop_reason})")
+    else:
+        print("\n⚠️  IMPORTANT: Remember to undeploy your endpoint to stop charges!")
+        print("Run: gcloud ai endpoints undeploy-model YOUR_ENDPOINT_ID --region=YOUR_REGION")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Compact top-k logprob sidecar for distillation
+
+The teacher already pays for the forward pass; with capture enabled we request
+top-k logprobs and keep the token distributions for the reasoning and label
+tokens. They are stored as flat float16/int32 arrays in append-only sidecar
+files, indexed by example id, and read back through np.memmap so a KD training
+loop never has to load the whole file into RAM.
+
+Files for a prefix such as data/teacher_logprobs:
+  <prefix>.meta.json      top-k size
+  <prefix>.index.jsonl    one line per example: id, offset, length, field spans
+  <prefix>.top_ids.i32    int32   [positions, k]  (-1 = padding)
+  <prefix>.top_lp.f16     float16 [positions, k]  (-inf = padding)
+  <prefix>.sampled.i32    int32   [positions]     token the teacher emitted
+"""
+
+import os
+import json
+import bisect
+
+import numpy as np
+
+DEFAULT_TOP_K = 20
+DEFAULT_FIELDS = ("reasoning", "classification")
+
+
+class TokenIdError(ValueError):
+    """Logprobs came back as token strings that cannot be mapped to ids"""
+
+
+def parse_logprobs(logprobs, k=DEFAULT_TOP_K, token_to_id=None):
+    """Normalize a vLLM/OpenAI-completions style logprobs object
+
+    Expects {"tokens", "token_logprobs", "top_logprobs", "text_offset"}.
+    Tokens are either "token_id:<int>" strings (vLLM return_tokens_as_token_ids)
+    or plain token strings mapped through token_to_id (see tokenizer_token_map).
+    Raises TokenIdError for string tokens without a mapping. Returns None if
+    the object is unusable.
+    """
+    if not logprobs or not logprobs.get("tokens"):
+        return None
+
+    def to_id(token):
+        if isinstance(token, int):
+            return token
+        if token.startswith("token_id:"):
+            return int(token[len("token_id:"):])
+        if token_to_id is None:
+            raise TokenIdError("Endpoint returned token strings, not token ids, "
+                               "and no tokenizer mapping is configured")
+        return int(token_to_id(token))
+
+    tokens = logprobs["tokens"]
+    n = len(tokens)
+    sampled = np.empty(n, dtype=np.int32)
+    top_ids = np.full((n, k), -1, dtype=np.int32)
+    top_lp = np.full((n, k), -np.inf, dtype=np.float16)
+
+    top_per_position = logprobs.get("top_logprobs") or [None] * n
+    for pos, token in enumerate(tokens):
+        sampled[pos] = to_id(token)
+        candidates = top_per_position[pos] or {token: logprobs["token_logprobs"][pos]}
+        ranked = sorted(candidates.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        for j, (cand, lp) in enumerate(ranked):
+            top_ids[pos, j] = to_id(cand)
+            top_lp[pos, j] = lp
+
+    return {
+        "sampled": sampled,
+        "top_ids": top_ids,
+        "top_lp": top_lp,
+        "text_offset": list(logprobs.get("text_offset") or []),
+    }
+
+
+def tokenizer_token_map(name):
+    """token string -> id via a Hugging Face tokenizer (raw vocab or decoded form)"""
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    vocab = tokenizer.get_vocab()
+    # Completions APIs usually return decoded token text (" the"), not "Ġthe"
+    decoded = {}
+    for token, token_id in vocab.items():
+        decoded.setdefault(tokenizer.convert_tokens_to_string([token]), token_id)
+
+    def to_id(token):
+        if token in vocab:
+            return vocab[token]
+        if token in decoded:
+            return decoded[token]
+        raise TokenIdError(f"Token {token!r} is not in the {name} vocabulary")
+
+    return to_id
+
+
+def field_char_span(text, field, start=0):
+    """Character span of a JSON string field's value inside the raw completion"""
+    key_idx = text.find(f'"{field}"', start)
+    if key_idx == -1:
+        return None
+    colon = text.find(':', key_idx + len(field) + 2)
+    open_quote = text.find('"', colon)
+    if colon == -1 or open_quote == -1:
+        return None
+
+    i = open_quote + 1
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+            continue
+        if text[i] == '"':
+            return open_quote + 1, i
+        i += 1
+    return None
+
+
+def token_span(text_offset, char_start, char_end):
+    """Token positions [start, end) overlapping a character span
+
+    Starts at the token containing char_start - BPE tokens like '"because'
+    straddle the opening quote and must not be dropped.
+    """
+    start = max(bisect.bisect_right(text_offset, char_start) - 1, 0)
+    return start, bisect.bisect_left(text_offset, char_end)
+
+
+class LogprobWriter:
+    """Append-only writer for the logprob sidecar"""
+
+    def __init__(self, prefix, k=DEFAULT_TOP_K):
+        self.prefix = prefix
+        self.k = k
+        os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+
+        meta_path = f"{prefix}.meta.json"
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                existing_k = json.load(f)["k"]
+            if existing_k != k:
+                raise ValueError(f"Sidecar {prefix} was written with k={existing_k}, not {k}")
+        else:
+            with open(meta_path, 'w') as f:
+                json.dump({"k": k}, f)
+
+        sampled_path = f"{prefix}.sampled.i32"
+        self.offset = os.path.getsize(sampled_path) // 4 if os.path.exists(sampled_path) else 0
+
+        self._index = open(f"{prefix}.index.jsonl", 'a')
+        self._top_ids = open(f"{prefix}.top_ids.i32", 'ab')
+        self._top_lp = open(f"{prefix}.top_lp.f16", 'ab')
+        self._sampled = open(sampled_path, 'ab')
+
+    def add(self, example_id, parsed, raw_text=None, json_start=0, fields=DEFAULT_FIELDS):
+        """Store one example's distributions
+
+        With raw_text (the completion the offsets refer to) only the token
+        positions inside the given JSON fields are kept; their spans are
+        recorded relative to the stored slice.
+        """
+        positions = slice(0, len(parsed["sampled"]))
+        spans = {}
+
+        if raw_text is not None and parsed["text_offset"]:
+            token_spans = {}
+            for field in fields:
+                char_span = field_char_span(raw_text, field, json_start)
+                if char_span:
+                    token_spans[field] = token_span(parsed["text_offset"], *char_span)
+            if token_spans:
+                first = min(s for s, _ in token_spans.values())
+                last = max(e for _, e in token_spans.values())
+                positions = slice(first, last)
+                spans = {f: [s - first, e - first] for f, (s, e) in token_spans.items()}
+
+        sampled = parsed["sampled"][positions]
+        self._sampled.write(sampled.astype(np.int32).tobytes())
+        self._top_ids.write(parsed["top_ids"][positions].astype(np.int32).tobytes())
+        self._top_lp.write(parsed["top_lp"][positions].astype(np.float16).tobytes())
+
+        self._index.write(json.dumps({
+            "id": example_id,
+            "offset": self.offset,
+            "length": len(sampled),
+            "spans": spans,
+        }) + '\n')
+        self.offset += len(sampled)
+
+    def flush(self):
+        for f in (self._sampled, self._top_ids, self._top_lp, self._index):
+            f.flush()
+
+    def close(self):
+        for f in (self._sampled, self._top_ids, self._top_lp, self._index):
+            f.close()
+
+
+class LogprobStore:
+    """Memory-mapped reader for the logprob sidecar"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        with open(f"{prefix}.meta.json") as f:
+            self.k = json.load(f)["k"]
+
+        self.index = {}
+        with open(f"{prefix}.index.jsonl") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    # Later entries win if an example was re-captured
+                    self.index[entry["id"]] = entry
+
+        total = os.path.getsize(f"{prefix}.sampled.i32") // 4
+        if total:
+            self.sampled = np.memmap(f"{prefix}.sampled.i32", dtype=np.int32, mode='r', shape=(total,))
+            self.top_ids = np.memmap(f"{prefix}.top_ids.i32", dtype=np.int32, mode='r', shape=(total, self.k))
+            self.top_lp = np.memmap(f"{prefix}.top_lp.f16", dtype=np.float16, mode='r', shape=(total, self.k))
+        else:
+            self.sampled = np.empty(0, dtype=np.int32)
+            self.top_ids = np.empty((0, self.k), dtype=np.int32)
+            self.top_lp = np.empty((0, self.k), dtype=np.float16)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, example_id):
+        return example_id in self.index
+
+    def ids(self):
+        return list(self.index)
+
+    def get(self, example_id, field=None):
+        """Views (no copy) of one example's arrays, optionally for a single field"""
+        entry = self.index[example_id]
+        start, end = entry["offset"], entry["offset"] + entry["length"]
+        if field is not None:
+            if field not in entry["spans"]:
+                raise KeyError(f"No '{field}' span recorded for example {example_id}")
+            s, e = entry["spans"][field]
+            start, end = entry["offset"] + s, entry["offset"] + e
+
+        return {
+            "sampled": self.sampled[start:end],
+            "top_ids": self.top_ids[start:end],
+            "top_lp": self.top_lp[start:end],
+        }
+
+
+def sparse_kd_loss(student_logits, top_ids, top_lp, temperature=1.0):
+    """KL(teacher_topk || student) over the teacher's top-k support
+
+    student_logits: [T, vocab] tensor aligned with the stored positions.
+    top_ids / top_lp: arrays from LogprobStore.get (padding = -1 / -inf).
+    """
+    import torch
+
+    ids = torch.as_tensor(np.asarray(top_ids), dtype=torch.long, device=student_logits.device)
+    lp = torch.as_tensor(np.asarray(top_lp, dtype=np.float32), device=student_logits.device)
+    mask = ids >= 0
+
+    # Renormalize the teacher's truncated distribution over its top-k
+    teacher_lp = torch.log_softmax(lp.masked_fill(~mask, float('-inf')) / temperature, dim=-1)
+    student_lp = torch.log_softmax(student_logits.float() / temperature, dim=-1)
+    student_topk = student_lp.gather(-1, ids.clamp(min=0))
+
+    kl = (teacher_lp.exp() * (teacher_lp - student_topk)).masked_fill(~mask, 0.0).sum(-1)
+    return kl.mean() * temperature ** 2
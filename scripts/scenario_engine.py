@@ -0,0 +1,396 @@
+"""
+Combinatorial scenario expansion engine
+Turns compact scenario templates into a lazy, stratified, deduplicated stream of
+concrete contexts (same shape as EXTENDED_SCENARIOS entries).
+
+Each template lists the axes it varies (age, decade, income, amount, risk,
+product, horizon, lookback, concept, market_event, framing) plus alternative
+phrasings; every phrasing must read correctly for every value of its axes.
+Combinations are addressed by index and visited in a seeded pseudo-random
+permutation, so the cartesian product is never materialized.
+"""
+
+import math
+import random
+import string
+import hashlib
+import zlib
+import collections
+
+# ============================================================
+# AXES
+# ============================================================
+AXES = {
+    "age": ["23", "27", "31", "35", "42", "48", "55", "62"],
+    "decade": ["20s", "30s", "40s", "50s", "60s"],
+    "income": ["45k", "60k", "85k", "120k", "200k"],
+    "amount": ["$5k", "$10k", "$25k", "$50k", "$100k", "$250k"],
+    # Adjectives: used as "I'm {risk}", "we're {risk}" and "a {risk} investor"
+    "risk": ["risk-averse", "fairly conservative", "moderately risk-tolerant",
+             "risk-tolerant", "very aggressive"],
+    "product": ["index funds", "individual tech stocks", "bonds", "Bitcoin",
+                "an annuity", "a Roth IRA", "target-date funds", "REITs"],
+    "horizon": ["2 years", "5 years", "10 years", "20+ years"],
+    # Looking back: short enough that every product existed
+    "lookback": ["2 years", "5 years", "10 years"],
+    "concept": ["the typical fees", "the tax treatment", "the liquidity",
+                "the historical volatility", "the source of returns", "the investor protections"],
+    "market_event": ["a 20% market drop", "rising interest rates", "high inflation",
+                     "a recession", "a bull market"],
+    # Closing sentence that states why a general question is being asked
+    "framing": ["Just curious.", "Just trying to understand the basics.",
+                "This is for a class assignment.", "I'm writing a blog post about it.",
+                "Settling a debate with a friend.", "Asking for a research project."],
+}
+
+# ============================================================
+# TEMPLATES
+# ============================================================
+SCENARIO_TEMPLATES = [
+    # CLEAR ADVICE - personal circumstances + specific product/action
+    {
+        "output_type": "advice_age_risk_allocation",
+        "should_be_advice": True,
+        "phrasings": [
+            "I'm {age}, making {income} a year, with {amount} sitting in checking. I'm {risk}. Where should I put this money?",
+            "{age} years old, {income} salary, {amount} saved and no debt. I'd call myself {risk}. What should I do with it?",
+            "Got {amount} saved on a {income} salary. I'm {age} and {risk}. How would you invest it?",
+        ],
+    },
+    {
+        "output_type": "advice_product_fit",
+        "should_be_advice": True,
+        "phrasings": [
+            "Should I put {amount} into {product}? I'm {age} and {risk}, and won't touch it for {horizon}.",
+            "I'm {age}, {risk}, thinking about moving {amount} into {product}. Good idea if I won't need it for {horizon}?",
+        ],
+    },
+    {
+        "output_type": "advice_windfall",
+        "should_be_advice": True,
+        "phrasings": [
+            "Just got a {amount} bonus. I'm {age}, earn {income}, and I'm {risk}. Invest it or pay down my mortgage?",
+            "Inherited {amount} at {age}. Household income is {income}, we're {risk}. What's the smartest move?",
+        ],
+    },
+    {
+        "output_type": "advice_rebalancing",
+        "should_be_advice": True,
+        "phrasings": [
+            "I'm {age} and {risk}. Most of my {amount} portfolio is in {product}. Should I rebalance?",
+            "Portfolio is {amount}, heavily in {product}. I'm {age} and {risk}. Should I shift some of it now?",
+        ],
+    },
+
+    # CLEAR EDUCATION - general explanations, no personal circumstances
+    {
+        "output_type": "education_product_concept",
+        "should_be_advice": False,
+        "phrasings": [
+            "Can someone explain how investing in {product} works, especially {concept}? {framing}",
+            "In general terms, what should people know about {concept} of {product}? {framing}",
+            "How would a textbook describe {concept} of {product}? {framing}",
+        ],
+    },
+    {
+        "output_type": "education_horizon_concept",
+        "should_be_advice": False,
+        "phrasings": [
+            "In general, how does an investment time horizon like {horizon} change how people think about {market_event}? {framing}",
+            "Why do textbooks say an event like {market_event} matters less over {horizon}? {framing}",
+        ],
+    },
+    {
+        "output_type": "education_risk_profile_concept",
+        "should_be_advice": False,
+        "phrasings": [
+            "What does it mean when a questionnaire labels someone as {risk}, and how would a portfolio holding {product} usually fit that profile? {framing}",
+            "How do advisors typically describe the way a {risk} investor views {product}? {framing}",
+        ],
+    },
+    {
+        "output_type": "education_market_event",
+        "should_be_advice": False,
+        "phrasings": [
+            "What typically happens to investments in {product} during {market_event}? {framing}",
+            "How do economists explain the performance of {product} during {market_event}? {framing}",
+        ],
+    },
+
+    # EDGE CASES - look personal or product-specific but stay general
+    {
+        "output_type": "edge_general_age_group",
+        "should_be_advice": False,
+        "phrasings": [
+            "How much of their portfolios do people in their {decade} typically keep in {product}? {framing}",
+            "Statistically, how common is owning {product} among investors in their {decade}? {framing}",
+        ],
+    },
+    {
+        "output_type": "edge_hypothetical_general",
+        "should_be_advice": False,
+        "phrasings": [
+            "Hypothetically, if someone put {amount} into {product} {lookback} ago, what factors would have driven the return? {framing}",
+            "In general, how would {amount} in {product} have behaved over the last {lookback} under different market conditions? {framing}",
+        ],
+    },
+    {
+        "output_type": "edge_income_statistics",
+        "should_be_advice": False,
+        "phrasings": [
+            "What percentage of income do households earning around {income} usually save during {market_event}, according to surveys? {framing}",
+            "According to surveys, how do households earning around {income} change their saving during {market_event}? {framing}",
+        ],
+    },
+]
+
+_FORMATTER = string.Formatter()
+
+
+def template_axes(template, axes_values=None):
+    """Return the ordered list of axes a template varies over"""
+    axes_values = axes_values if axes_values is not None else AXES
+    axes = []
+    for phrasing in template["phrasings"]:
+        for _, field, _, _ in _FORMATTER.parse(phrasing):
+            if field and field not in axes:
+                axes.append(field)
+    for phrasing in template["phrasings"]:
+        used = {field for _, field, _, _ in _FORMATTER.parse(phrasing) if field}
+        if used != set(axes):
+            # Every phrasing must use the same axes, otherwise distinct
+            # combinations would render to the same text
+            raise ValueError(f"Phrasings of {template['output_type']} use different axes")
+        for field in used:
+            if field not in axes_values:
+                raise ValueError(f"Unknown axis '{field}' in {template['output_type']}")
+    return axes
+
+
+def fixed_templates(scenarios):
+    """Wrap fixed scenarios (e.g. EXTENDED_SCENARIOS) as single-point templates"""
+    return [
+        {
+            "output_type": s["output_type"],
+            "should_be_advice": s["should_be_advice"],
+            # Escape braces so the context is rendered verbatim
+            "phrasings": [s["context"].replace("{", "{{").replace("}", "}}")],
+        }
+        for s in scenarios
+    ]
+
+
+def _stable_seed(seed, name):
+    return zlib.crc32(f"{seed}:{name}".encode())
+
+
+def _coprime_stride(n, rng):
+    """Random stride that is coprime with n, so i -> (a*i + b) % n is a permutation"""
+    if n <= 2:
+        return 1
+    while True:
+        a = rng.randrange(1, n)
+        if math.gcd(a, n) == 1:
+            return a
+
+
+class ScenarioEngine:
+    """Lazy stream of concrete scenarios expanded from templates"""
+
+    def __init__(self, templates=None, axes=None, seed=42, shard_index=0, num_shards=1,
+                 advice_ratio=0.5):
+        if not 0 <= shard_index < num_shards:
+            raise ValueError("shard_index must be in [0, num_shards)")
+
+        self.templates = templates if templates is not None else SCENARIO_TEMPLATES
+        self.axes = axes if axes is not None else AXES
+        self.seed = seed
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.advice_ratio = advice_ratio
+        self.template_axes = [template_axes(t, self.axes) for t in self.templates]
+
+    # ------------------------------------------------------------
+    # Per-template expansion
+    # ------------------------------------------------------------
+    def template_size(self, t_idx):
+        """Number of concrete contexts a template can produce"""
+        size = len(self.templates[t_idx]["phrasings"])
+        for axis in self.template_axes[t_idx]:
+            size *= len(self.axes[axis])
+        return size
+
+    def size(self):
+        return sum(self.template_size(i) for i in range(len(self.templates)))
+
+    def render(self, t_idx, combo_idx):
+        """Decode a mixed-radix combination index into a concrete scenario"""
+        template = self.templates[t_idx]
+        params = {}
+        for axis in self.template_axes[t_idx]:
+            values = self.axes[axis]
+            combo_idx, pos = divmod(combo_idx, len(values))
+            params[axis] = values[pos]
+        phrasing = template["phrasings"][combo_idx]
+
+        return {
+            "context": phrasing.format(**params),
+            "should_be_advice": template["should_be_advice"],
+            "output_type": template["output_type"],
+            "params": params,
+        }
+
+    def template_stream(self, t_idx):
+        """Yield every combination of one template in seeded permuted order"""
+        n = self.template_size(t_idx)
+        rng = random.Random(_stable_seed(self.seed, self.templates[t_idx]["output_type"]))
+        stride = _coprime_stride(n, rng)
+        offset = rng.randrange(n)
+        for i in range(n):
+            yield self.render(t_idx, (stride * i + offset) % n)
+
+    # ------------------------------------------------------------
+    # Class quotas
+    # ------------------------------------------------------------
+    def class_capacity(self, should_be_advice):
+        """Upper bound on contexts one class can yield on this shard"""
+        total = sum(self.template_size(i) for i, t in enumerate(self.templates)
+                    if t["should_be_advice"] == should_be_advice)
+        return total // self.num_shards
+
+    def class_quotas(self, total):
+        """Split a request into ADVICE / NOT_ADVICE quotas at advice_ratio
+
+        Raises ValueError if a class cannot fill its quota, instead of
+        silently drifting away from the requested ratio.
+        """
+        advice = round(total * self.advice_ratio)
+        quotas = {True: advice, False: total - advice}
+        for label, quota in quotas.items():
+            capacity = self.class_capacity(label)
+            if quota > capacity:
+                name = "ADVICE" if label else "NOT_ADVICE"
+                raise ValueError(
+                    f"{name} quota {quota} exceeds template capacity {capacity} on this shard "
+                    f"(advice_ratio={self.advice_ratio}); widen the {name} templates or request fewer examples")
+        return quotas
+
+    # ------------------------------------------------------------
+    # Stratified streams
+    # ------------------------------------------------------------
+    def _round_robin(self, indices):
+        streams = collections.deque((i, self.template_stream(i)) for i in indices)
+        while streams:
+            t_idx, stream = streams.popleft()
+            item = next(stream, None)
+            if item is None:
+                continue
+            streams.append((t_idx, stream))
+            yield item
+
+    def class_stream(self, should_be_advice):
+        """Deduplicated round-robin over one class's templates, restricted to this shard"""
+        indices = [i for i, t in enumerate(self.templates) if t["should_be_advice"] == should_be_advice]
+        seen = set()
+        position = 0
+        for item in self._round_robin(indices):
+            digest = hashlib.blake2b(item["context"].encode(), digest_size=8).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+
+            # Shard on the deduplicated position so shards never overlap
+            mine = position % self.num_shards == self.shard_index
+            position += 1
+            if mine:
+                yield item
+
+    def class_groups(self):
+        """One (label scenario, lazy stream) pair per class - quotas come from class_quotas"""
+        return [
+            ({"output_type": "engine_advice", "should_be_advice": True}, self.class_stream(True)),
+            ({"output_type": "engine_not_advice", "should_be_advice": False}, self.class_stream(False)),
+        ]
+
+    def stream(self, limit=None):
+        """Stratified stream: per-class round-robins interleaved at advice_ratio
+
+        Stops as soon as the class due next runs out, so the ratio always
+        holds; with a limit, capacity is checked up front (ValueError).
+        """
+        if limit is not None:
+            self.class_quotas(limit)
+
+        advice = self.class_stream(True)
+        other = self.class_stream(False)
+        n_advice = n_total = 0
+        while limit is None or n_total < limit:
+            want_advice = n_advice < self.advice_ratio * (n_total + 1)
+            item = next(advice if want_advice else other, None)
+            if item is None:
+                return
+            n_total += 1
+            n_advice += want_advice
+            yield item
+
+    def __iter__(self):
+        return self.stream()
+
+
+def stream_stats(items, axes=None):
+    """Coverage statistics for a (finite) scenario stream"""
+    axes = axes if axes is not None else AXES
+    by_type = collections.Counter()
+    axis_values = collections.defaultdict(set)
+    advice = total = 0
+
+    for item in items:
+        total += 1
+        advice += item["should_be_advice"]
+        by_type[item["output_type"]] += 1
+        for axis, value in item.get("params", {}).items():
+            axis_values[axis].add(value)
+
+    return {
+        "total": total,
+        "advice": advice,
+        "not_advice": total - advice,
+        "by_type": dict(by_type),
+        "axis_coverage": {axis: (len(axis_values[axis]), len(values))
+                          for axis, values in axes.items()},
+    }
+
+
+def print_stream_stats(engine, limit=5000):
+    """Print distribution and axis coverage of the first `limit` scenarios"""
+    try:
+        stats = stream_stats(engine.stream(limit=limit), engine.axes)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return None
+    total = stats["total"]
+
+    print(f"Templates: {len(engine.templates)}")
+    print(f"Combination space: {engine.size():,}")
+    print(f"Shard: {engine.shard_index + 1}/{engine.num_shards} (seed={engine.seed})")
+    print(f"Streamed scenarios: {total}")
+    if total == 0:
+        return stats
+    print(f"Should be ADVICE: {stats['advice']}")
+    print(f"Should be NOT_ADVICE: {stats['not_advice']}")
+    print(f"Distribution: {stats['advice']/total*100:.1f}% advice, {stats['not_advice']/total*100:.1f}% not advice")
+
+    print("\nPer scenario type:")
+    for output_type, count in sorted(stats["by_type"].items()):
+        print(f"  {output_type}: {count}")
+
+    print("\nAxis coverage:")
+    for axis, (seen, available) in stats["axis_coverage"].items():
+        print(f"  {axis}: {seen}/{available} values")
+    return stats
+
+
+if __name__ == "__main__":
+    import sys
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print_stream_stats(ScenarioEngine(), limit=limit)
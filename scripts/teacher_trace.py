@@ -0,0 +1,251 @@
+"""
+Teacher request/response traces with offline replay
+
+The generator records every teacher call (request, raw prediction, timing,
+parse outcome) to a gzip-compressed, append-only JSONL trace. Replaying a
+trace pushes the recorded predictions through the *current* parsing,
+validation and formatting code at local speed, so the effect of a code
+change on yield can be measured without touching the paid endpoint.
+Top-k logprobs are not traced (they go to the logprob sidecar); such
+predictions only carry a logprobs_captured flag.
+
+Usage:
+  python teacher_trace.py replay data/teacher_trace.jsonl.gz --out replay_new.jsonl
+  python teacher_trace.py diff replay_old.jsonl replay_new.jsonl
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import zlib
+import atexit
+import hashlib
+import argparse
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+FLUSH_EVERY = 20  # Records buffered before the gzip member is flushed
+
+
+class TraceRecorder:
+    """Append-only gzip JSONL recorder; the file is opened on first record"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._pending = 0
+
+    def record(self, **fields):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Appending adds a new gzip member - gzip readers handle multi-member files
+            self._file = gzip.open(self.path, 'at', encoding='utf-8')
+            atexit.register(self.close)
+
+        fields['ts'] = time.time()
+        self._file.write(json.dumps(fields, default=str) + '\n')
+        self._pending += 1
+        if self._pending >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+            self._pending = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_trace(path):
+    """Yield trace records, stopping cleanly at a truncated tail (crashed run)"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        return
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            return
+
+
+# ============================================================
+# REPLAY
+# ============================================================
+def _replay_chunk(chunk):
+    """Run recorded predictions through the current generator code"""
+    # Imported here: the generator itself imports this module
+    import generate_training_data as gtd
+    from validation import check_example
+
+    outcomes = []
+    for idx, record in chunk:
+        scenario = record.get('scenario') or {'output_type': 'unknown'}
+        prediction = record.get('prediction')
+
+        result = gtd.parse_teacher_output(prediction) if prediction is not None else None
+        if result is not None:
+            result.pop('_logprobs', None)
+        rejected_by = check_example(result, scenario) if result is not None else []
+        example = gtd.validate_example(result, scenario) if result is not None else None
+
+        formatted_hash = None
+        if example is not None:
+            formatted = gtd.format_example({**example, 'example_id': idx})
+            formatted_hash = hashlib.sha1(
+                json.dumps(formatted, sort_keys=True).encode()).hexdigest()[:16]
+
+        outcomes.append({
+            'idx': idx,
+            'scenario_type': scenario.get('output_type'),
+            'recorded_parsed': record.get('parsed'),
+            'parsed': result is not None,
+            'accepted': example is not None,
+            'rejected_by': rejected_by,
+            'classification': example['classification'] if example else None,
+            'formatted_hash': formatted_hash,
+            'latency_s': record.get('latency_s'),
+        })
+    return outcomes
+
+
+def _chunks(records, size):
+    chunk = []
+    for idx, record in enumerate(records):
+        chunk.append((idx, record))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay(trace_path, out_path=None, workers=None, chunk_size=500):
+    """Replay a trace in parallel and return per-record outcomes"""
+    started = time.time()
+    outcomes = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk_outcomes in pool.map(_replay_chunk, _chunks(read_trace(trace_path), chunk_size)):
+            outcomes.extend(chunk_outcomes)
+    elapsed = time.time() - started
+
+    if out_path:
+        with open(out_path, 'w') as f:
+            for outcome in outcomes:
+                f.write(json.dumps(outcome) + '\n')
+
+    print_replay_summary(outcomes, elapsed)
+    return outcomes
+
+
+def _rate(outcomes, key):
+    return sum(1 for o in outcomes if o[key]) / len(outcomes) * 100 if outcomes else 0.0
+
+
+def print_replay_summary(outcomes, elapsed=None):
+    total = len(outcomes)
+    print("=" * 60)
+    print("TRACE REPLAY")
+    print("=" * 60)
+    print(f"Records: {total}")
+    if elapsed is not None:
+        print(f"Replay time: {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} records/s)")
+    if not total:
+        return
+
+    recorded = [o for o in outcomes if o['recorded_parsed'] is not None]
+    if recorded:
+        print(f"Parse rate (recorded): {_rate(recorded, 'recorded_parsed'):.1f}%")
+    print(f"Parse rate (current):  {_rate(outcomes, 'parsed'):.1f}%")
+    print(f"Accept rate (current): {_rate(outcomes, 'accepted'):.1f}%")
+
+    rule_counts = collections.Counter(r for o in outcomes for r in o.get('rejected_by', []))
+    if rule_counts:
+        print("Rejections by rule: " + ", ".join(f"{r}={n}" for r, n in rule_counts.most_common()))
+
+    latencies = sorted(o['latency_s'] for o in outcomes if o['latency_s'] is not None)
+    if latencies:
+        print(f"Recorded latency: median {latencies[len(latencies) // 2]:.1f}s | "
+              f"total {sum(latencies) / 3600:.2f} endpoint-hours")
+
+    by_type = collections.defaultdict(list)
+    for o in outcomes:
+        by_type[o['scenario_type']].append(o)
+    print("\nAccept rate per scenario:")
+    for scenario_type, items in sorted(by_type.items(), key=lambda kv: str(kv[0])):
+        print(f"  {scenario_type}: {_rate(items, 'accepted'):.1f}% of {len(items)}")
+
+
+def load_outcomes(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def diff(old_path, new_path, show=10):
+    """Compare two replay outputs of the same trace"""
+    old = {o['idx']: o for o in load_outcomes(old_path)}
+    new = {o['idx']: o for o in load_outcomes(new_path)}
+    common = sorted(set(old) & set(new))
+
+    newly_accepted = [i for i in common if new[i]['accepted'] and not old[i]['accepted']]
+    newly_rejected = [i for i in common if old[i]['accepted'] and not new[i]['accepted']]
+    relabeled = [i for i in common if old[i]['accepted'] and new[i]['accepted']
+                 and old[i]['classification'] != new[i]['classification']]
+    reformatted = [i for i in common if old[i]['accepted'] and new[i]['accepted']
+                   and old[i]['formatted_hash'] != new[i]['formatted_hash']]
+
+    old_common = [old[i] for i in common]
+    new_common = [new[i] for i in common]
+
+    print("=" * 60)
+    print("REPLAY DIFF")
+    print("=" * 60)
+    print(f"Records compared: {len(common)}")
+    print(f"Parse rate:  {_rate(old_common, 'parsed'):.1f}% -> {_rate(new_common, 'parsed'):.1f}%")
+    print(f"Accept rate: {_rate(old_common, 'accepted'):.1f}% -> {_rate(new_common, 'accepted'):.1f}%")
+    print(f"Newly accepted: {len(newly_accepted)}")
+    print(f"Newly rejected: {len(newly_rejected)}")
+    print(f"Label changed:  {len(relabeled)}")
+    print(f"Formatting changed: {len(reformatted)}")
+
+    for name, idxs in (("newly accepted", newly_accepted), ("newly rejected", newly_rejected),
+                       ("label changed", relabeled)):
+        if idxs:
+            print(f"\nFirst {name} record ids: {idxs[:show]}")
+
+    return {
+        'newly_accepted': newly_accepted,
+        'newly_rejected': newly_rejected,
+        'relabeled': relabeled,
+        'reformatted': reformatted,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded teacher traces offline")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    replay_p = sub.add_parser('replay', help="Run a trace through the current code")
+    replay_p.add_argument('trace')
+    replay_p.add_argument('--out', help="Write per-record outcomes (JSONL) for diffing")
+    replay_p.add_argument('--workers', type=int, default=None)
+    replay_p.add_argument('--chunk-size', type=int, default=500)
+
+    diff_p = sub.add_parser('diff', help="Compare two replay outputs")
+    diff_p.add_argument('old')
+    diff_p.add_argument('new')
+
+    args = parser.parse_args()
+    if args.command == 'replay':
+        if not os.path.exists(args.trace):
+            print(f"❌ Trace not found: {args.trace}")
+            sys.exit(1)
+        replay(args.trace, args.out, args.workers, args.chunk_size)
+    else:
+        diff(args.old, args.new)
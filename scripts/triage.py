@@ -0,0 +1,235 @@
+"""
+Local pre-classifier that triages which candidates need the 70B teacher
+
+A TF-IDF + logistic regression model is trained on already-labeled teacher
+output. Candidates are scored locally in bulk; only uncertain items (and items
+whose confident local label disagrees with the expected label) are routed to
+the teacher - uncertainty sampling, as in active learning.
+
+This is a standalone scorer, not a stage of generate_training_data.py: the
+generator asks the teacher to *write* each llm_output, so there is no text to
+triage before the call. The train report estimates how many labeling calls a
+confidence cut would skip. route writes review queues (<prefix>_auto.jsonl,
+<prefix>_teacher.jsonl) for externally sourced candidates, e.g.
+candidates_balanced.csv. Nothing in the pipeline reads them yet. They are not
+training data: auto-labeled rows have no teacher reasoning and CSV candidates
+have no llm_output, so export_formatted cannot take them.
+
+Usage:
+  python triage.py train data/training_data_raw.json
+  python triage.py route ../ai-innovation/candidates_balanced.csv --low 0.1 --high 0.9
+"""
+
+import os
+import sys
+import json
+import pickle
+import argparse
+
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+
+MODEL_PATH = 'data/triage_model.pkl'
+
+# Items scored between LOW and HIGH (P(ADVICE)) go to the teacher
+LOW_THRESHOLD = 0.15
+HIGH_THRESHOLD = 0.85
+
+
+def load_labeled(path):
+    """Load labeled examples (training_data_raw.json or formatted .jsonl)"""
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            items = json.load(f)
+
+    texts, labels = [], []
+    for item in items:
+        text = item.get('llm_output', item.get('input'))
+        label = item.get('classification', item.get('output'))
+        if text and label in ('ADVICE', 'NOT_ADVICE'):
+            texts.append(text)
+            labels.append(1 if label == 'ADVICE' else 0)
+    return texts, labels
+
+
+def load_candidates(path):
+    """Load candidates as dicts with a 'text' field (CSV or JSON/JSONL)"""
+    if path.endswith('.csv'):
+        df = pd.read_csv(path)
+        if 'llm_output' in df.columns:
+            df['text'] = df['llm_output'].astype(str)
+        else:
+            # candidates_balanced.csv: question + answer
+            df['text'] = df['instruction'].astype(str) + "\n" + df['output'].astype(str)
+        return df.to_dict('records')
+
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            items = [json.loads(line) for line in f if line.strip()]
+        else:
+            items = json.load(f)
+    for item in items:
+        item['text'] = item.get('llm_output', item.get('input', ''))
+    return items
+
+
+def build_model():
+    return make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True, max_features=50000),
+        LogisticRegression(max_iter=1000, class_weight='balanced'),
+    )
+
+
+def route(probs, low=LOW_THRESHOLD, high=HIGH_THRESHOLD, expected=None):
+    """Decide per item: 'ADVICE', 'NOT_ADVICE' (auto-labeled) or 'TEACHER'
+
+    expected is an optional list of expected labels (e.g. the scenario's
+    should_be_advice); a confident local label that contradicts it is
+    routed to the teacher.
+    """
+    decisions = []
+    for i, p in enumerate(probs):
+        if p >= high:
+            decision = 'ADVICE'
+        elif p <= low:
+            decision = 'NOT_ADVICE'
+        else:
+            decision = 'TEACHER'
+
+        if decision != 'TEACHER' and expected is not None and expected[i] is not None:
+            if (decision == 'ADVICE') != bool(expected[i]):
+                decision = 'TEACHER'
+        decisions.append(decision)
+    return decisions
+
+
+def triage_report(labels, probs, low=LOW_THRESHOLD, high=HIGH_THRESHOLD):
+    """Teacher calls saved and agreement with teacher labels on a held-out set"""
+    decisions = route(probs, low, high)
+    auto = [(d, y) for d, y in zip(decisions, labels) if d != 'TEACHER']
+    agree = sum(1 for d, y in auto if (d == 'ADVICE') == bool(y))
+    overall = sum(1 for p, y in zip(probs, labels) if (p >= 0.5) == bool(y))
+
+    return {
+        'total': len(labels),
+        'auto_labeled': len(auto),
+        'teacher_calls': len(labels) - len(auto),
+        'calls_saved_pct': len(auto) / len(labels) * 100 if labels else 0.0,
+        'auto_agreement_pct': agree / len(auto) * 100 if auto else 0.0,
+        'overall_agreement_pct': overall / len(labels) * 100 if labels else 0.0,
+    }
+
+
+def print_report(report, low, high):
+    print(f"Thresholds: auto NOT_ADVICE <= {low} | auto ADVICE >= {high}")
+    print(f"Held-out examples: {report['total']}")
+    print(f"Auto-labeled: {report['auto_labeled']} ({report['calls_saved_pct']:.1f}% of teacher calls could be skipped)")
+    print(f"Routed to teacher: {report['teacher_calls']}")
+    print(f"Agreement with teacher (auto-labeled only): {report['auto_agreement_pct']:.1f}%")
+    print(f"Agreement with teacher (all, argmax): {report['overall_agreement_pct']:.1f}%")
+
+
+def train(labeled_path, model_path=MODEL_PATH, low=LOW_THRESHOLD, high=HIGH_THRESHOLD,
+          test_size=0.2, seed=42):
+    """Fit on labeled output, report on a held-out split, save the final model"""
+    texts, labels = load_labeled(labeled_path)
+    if len(set(labels)) < 2:
+        print("❌ Need both ADVICE and NOT_ADVICE examples to train")
+        return None
+
+    print(f"Loaded {len(texts)} labeled examples from {labeled_path}")
+    X_train, X_test, y_train, y_test = train_test_split(
+        texts, labels, test_size=test_size, random_state=seed, stratify=labels)
+
+    model = build_model()
+    model.fit(X_train, y_train)
+    probs = model.predict_proba(X_test)[:, 1]
+    report = triage_report(y_test, probs, low, high)
+
+    print("\n" + "=" * 60)
+    print("TRIAGE HELD-OUT REPORT")
+    print("=" * 60)
+    print_report(report, low, high)
+
+    # Refit on everything for production use
+    model = build_model()
+    model.fit(texts, labels)
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    with open(model_path, 'wb') as f:
+        pickle.dump(model, f)
+    print(f"\n✓ Model saved to {model_path}")
+    return report
+
+
+def route_candidates(candidates_path, model_path=MODEL_PATH, low=LOW_THRESHOLD,
+                     high=HIGH_THRESHOLD, output_prefix=None):
+    """Score candidates in bulk and split them into auto-labeled / teacher review queues
+
+    Rows keep their original fields plus triage_p_advice (and classification /
+    label_source on auto-labeled rows); see the module docstring for why they
+    are not in the training-data schema.
+    """
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+
+    candidates = load_candidates(candidates_path)
+    probs = model.predict_proba([c['text'] for c in candidates])[:, 1]
+    expected = [c.get('should_be_advice') for c in candidates]
+    decisions = route(probs, low, high, expected)
+
+    output_prefix = output_prefix or os.path.splitext(candidates_path)[0]
+    auto_path = f"{output_prefix}_auto.jsonl"
+    teacher_path = f"{output_prefix}_teacher.jsonl"
+
+    n_auto = 0
+    with open(auto_path, 'w') as auto_f, open(teacher_path, 'w') as teacher_f:
+        for candidate, p, decision in zip(candidates, probs, decisions):
+            candidate['triage_p_advice'] = round(float(p), 4)
+            if decision == 'TEACHER':
+                teacher_f.write(json.dumps(candidate, default=str) + '\n')
+            else:
+                candidate['classification'] = decision
+                candidate['label_source'] = 'triage'
+                auto_f.write(json.dumps(candidate, default=str) + '\n')
+                n_auto += 1
+
+    total = len(candidates)
+    print(f"Candidates: {total}")
+    print(f"Auto-labeled: {n_auto} -> {auto_path}")
+    print(f"Routed to teacher: {total - n_auto} -> {teacher_path}")
+    if total:
+        print(f"Would skip the teacher: {n_auto} ({n_auto/total*100:.1f}%)")
+    return decisions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local triage before the teacher model")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    train_p = sub.add_parser('train', help="Train on labeled teacher output")
+    train_p.add_argument('labeled', help="training_data_raw.json or formatted .jsonl")
+    route_p = sub.add_parser('route', help="Score candidates and split by confidence")
+    route_p.add_argument('candidates', help="CSV or JSON/JSONL candidates")
+    route_p.add_argument('--output-prefix')
+
+    for p in (train_p, route_p):
+        p.add_argument('--model', default=MODEL_PATH)
+        p.add_argument('--low', type=float, default=LOW_THRESHOLD,
+                       help="P(ADVICE) at or below this is auto-labeled NOT_ADVICE")
+        p.add_argument('--high', type=float, default=HIGH_THRESHOLD,
+                       help="P(ADVICE) at or above this is auto-labeled ADVICE")
+
+    args = parser.parse_args()
+    if not 0 <= args.low < args.high <= 1:
+        print("❌ Thresholds must satisfy 0 <= low < high <= 1")
+        sys.exit(1)
+
+    if args.command == 'train':
+        train(args.labeled, args.model, args.low, args.high)
+    else:
+        route_candidates(args.candidates, args.model, args.low, args.high, args.output_prefix)
@@ -0,0 +1,125 @@
+"""
+Streaming label-consistency validation for teacher examples
+
+Every parsed example is checked as it arrives, before it counts toward its
+scenario quota. Rejected examples are simply not counted, so the generator
+requeues the scenario right away instead of discovering bad data after the
+paid run.
+
+Rules:
+  schema              llm_output/classification/reasoning/criteria_met present and typed
+  label_criteria      ADVICE if and only if all three criteria are met
+  scenario_agreement  classification matches the scenario's should_be_advice
+  length_window       llm_output word count within [MIN_WORDS, MAX_WORDS]
+"""
+
+import json
+import collections
+
+LABELS = ("ADVICE", "NOT_ADVICE")
+CRITERIA = ("personalized", "specific_action", "persuasive_intent")
+
+# Prompt asks for 100-200 words; leave some slack either side
+MIN_WORDS = 60
+MAX_WORDS = 300
+
+
+def check_schema(example, scenario):
+    if not isinstance(example.get('llm_output'), str) or not example['llm_output'].strip():
+        return False
+    if example.get('classification') not in LABELS:
+        return False
+    if not isinstance(example.get('reasoning'), str) or not example['reasoning'].strip():
+        return False
+    criteria = example.get('criteria_met')
+    if not isinstance(criteria, dict):
+        return False
+    return all(isinstance(criteria.get(c), bool) for c in CRITERIA)
+
+
+def check_label_criteria(example, scenario):
+    all_met = all(example['criteria_met'][c] for c in CRITERIA)
+    return all_met == (example['classification'] == 'ADVICE')
+
+
+def check_scenario_agreement(example, scenario):
+    if 'should_be_advice' not in scenario:
+        return True
+    return scenario['should_be_advice'] == (example['classification'] == 'ADVICE')
+
+
+def check_length_window(example, scenario, min_words=MIN_WORDS, max_words=MAX_WORDS):
+    return min_words <= len(example['llm_output'].split()) <= max_words
+
+
+# Schema must run first - the other rules assume its fields exist
+RULES = [
+    ("schema", check_schema),
+    ("label_criteria", check_label_criteria),
+    ("scenario_agreement", check_scenario_agreement),
+    ("length_window", check_length_window),
+]
+
+
+def check_example(example, scenario):
+    """Return the names of the rules an example fails (empty list = valid)"""
+    if not example:
+        return ["schema"]
+    if not check_schema(example, scenario):
+        return ["schema"]
+    return [name for name, rule in RULES[1:] if not rule(example, scenario)]
+
+
+class ValidationStats:
+    """Per-rule and per-scenario rejection counters for a run
+
+    Teacher calls that never produced a parsed result (transport errors,
+    no JSON in the completion) are counted separately as unparsed, so the
+    rule counts match a trace replay, which only checks parsed records.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.accepted = 0
+        self.unparsed = 0
+        self.unparsed_by_scenario = collections.Counter()
+        self.rejections = collections.Counter()
+        self.by_scenario = collections.defaultdict(collections.Counter)
+
+    def record(self, scenario_type, failures):
+        self.checked += 1
+        if not failures:
+            self.accepted += 1
+            return
+        for rule in failures:
+            self.rejections[rule] += 1
+            self.by_scenario[scenario_type][rule] += 1
+
+    def record_unparsed(self, scenario_type):
+        self.unparsed += 1
+        self.unparsed_by_scenario[scenario_type] += 1
+
+    def report(self):
+        return {
+            "unparsed": self.unparsed,
+            "unparsed_by_scenario": dict(self.unparsed_by_scenario),
+            "checked": self.checked,
+            "accepted": self.accepted,
+            "rejected": self.checked - self.accepted,
+            "rejections_by_rule": dict(self.rejections),
+            "rejections_by_scenario": {k: dict(v) for k, v in self.by_scenario.items()},
+        }
+
+    def print_report(self):
+        rejected = self.checked - self.accepted
+        print(f"\nValidation:")
+        print(f"  Unparsed (parse/transport failures, not checked): {self.unparsed}")
+        print(f"  Checked: {self.checked}")
+        print(f"  Accepted: {self.accepted}")
+        print(f"  Rejected: {rejected}")
+        for name, _ in RULES:
+            print(f"    {name}: {self.rejections.get(name, 0)}")
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)